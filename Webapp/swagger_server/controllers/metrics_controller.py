@@ -0,0 +1,18 @@
+import connexion
+import six
+
+from swagger_server import util
+from swagger_server.sofia_functions import _metrics
+from swagger_server.security import requires_auth
+
+
+@requires_auth
+def metrics():  # noqa: E501
+    """Receive reading metrics
+
+    Receive stage latency histograms, counters and error counters of the reader in the Prometheus text format. Metrics are only recorded when the &#x60;SOFIA_METRICS&#x60; environment variable is set. # noqa: E501
+
+
+    :rtype: str
+    """
+    return _metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
@@ -1,4 +1,5 @@
 from sofia import SOFIA
+from sofia import instrumentation
 import json
 import redis
 from hashlib import sha1
@@ -108,6 +109,13 @@ def _obtain_results(id_):
     else:
         return 'Endpoint not supported.'
 
+def _metrics():
+    '''
+    Returns the reading metrics (stage latencies, counters, errors) in the
+    Prometheus text format. Metrics are only recorded when SOFIA_METRICS is set.
+    '''
+    return instrumentation.prometheus_text()
+
 def gen_id(text):
     '''
     Generates a SHA1 as a SOFIA ID using the epoch timestamp
@@ -0,0 +1,249 @@
+"""Benchmarks the SOFIA reading pipeline on saved CoreNLP annotations (no CoreNLP server needed).
+
+    python benchmarks/bench_pipeline.py                      # run and compare against the baseline
+    python benchmarks/bench_pipeline.py --update-baseline    # run and store the results as the baseline
+    python benchmarks/bench_pipeline.py --corpus DIR         # run on another directory of CoreNLP JSON files
+    python benchmarks/bench_pipeline.py --replay DIR         # run on the slow documents kept by sofia.profiling
+
+Exits with status 1 when a stage or the throughput is worse than the baseline by more than --tolerance.
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sofia.main
+from sofia.causal_extraction import CausalLinks
+from sofia.corenlp_parse import DataExtractor
+from sofia.event_extraction import CandidateEvents
+from sofia.main import SOFIA
+from sofia.semantic_units import output_records
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+stages = ['structure', 'semantic_units', 'causal', 'sentence_output', 'serialize']
+percentiles = [50, 90, 99]
+
+
+class StageTimer:
+    def __init__(self):
+        self.causal = 0.0
+
+    def timed_causal_links(self):
+        timer = self
+
+        class TimedCausalLinks(CausalLinks):
+            def __init__(self, *args, **kwargs):
+                start = time.perf_counter()
+                CausalLinks.__init__(self, *args, **kwargs)
+                timer.causal += time.perf_counter() - start
+
+            def get_causal_nodes(self):
+                start = time.perf_counter()
+                nodes = CausalLinks.get_causal_nodes(self)
+                timer.causal += time.perf_counter() - start
+                return nodes
+        return TimedCausalLinks
+
+
+def load_corpus(path):
+    corpus = []
+    for file_name in sorted(os.listdir(path)):
+        if file_name.endswith('.json'):
+            with open(os.path.join(path, file_name)) as f:
+                corpus.append((file_name[:-len('.json')], json.load(f)))
+    return corpus
+
+
+def load_ring(path):
+    """Loads the annotations of the slow documents kept in a sofia.profiling ring directory."""
+    corpus = []
+    for entry in sorted(os.listdir(path)):
+        annotation_file = os.path.join(path, entry, 'annotations.json')
+        if not entry.startswith('.') and os.path.exists(annotation_file):
+            with open(os.path.join(path, entry, 'meta.json')) as f:
+                doc_id = json.load(f)['doc_id']
+            with open(annotation_file) as f:
+                corpus.append((doc_id, json.load(f)))
+    return corpus
+
+
+def run_document(reader, timer, doc_id, annotations):
+    """Runs one document through the pipeline; returns the seconds spent in each stage, its number of
+    sentences and the number of its entities and events grounded in the ontology."""
+    times = {}
+    start = time.perf_counter()
+    data_extractor = DataExtractor(annotations)
+    times['structure'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    event_reader = CandidateEvents(data_extractor, lexicon=reader.lexicon)
+    all_events, all_entities = event_reader.get_semantic_units()
+    times['semantic_units'] = time.perf_counter() - start
+
+    timer.causal = 0.0
+    output = []
+    start = time.perf_counter()
+    for s_index in range(data_extractor.get_data_size()):
+        output.append(reader.sentence_output(doc_id, data_extractor, s_index, all_events[s_index],
+                                             all_entities[s_index], 'None', 'None'))
+    # CausalLinks runs inside sentence_output; report it as its own stage.
+    times['causal'] = timer.causal
+    times['sentence_output'] = time.perf_counter() - start - timer.causal
+
+    start = time.perf_counter()
+    json.dumps(output_records(output))
+    times['serialize'] = time.perf_counter() - start
+    grounded = sum(1 for result in output for unit in result.entities + result.events if unit.frame)
+    return times, data_extractor.get_data_size(), grounded
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(0, int(math.ceil(p / 100.0 * len(values))) - 1)]
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return rss / (1024.0 * 1024.0) if sys.platform == 'darwin' else rss / 1024.0
+
+
+def output_memory_kb(reader, corpus):
+    """Mean KB allocated while reading a document and still held by its sentence results."""
+    retained = []
+    for doc_id, annotations in corpus:
+        data_extractor = DataExtractor(annotations)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        output = reader.get_output(data_extractor, doc_id)
+        retained.append(tracemalloc.get_traced_memory()[0] - before)
+        tracemalloc.stop()
+        del output
+    return sum(retained) / len(retained) / 1024.0
+
+
+def run_benchmark(corpus, ontology, repeat, warmup):
+    reader = SOFIA(ontology, start_server=False)
+    timer = StageTimer()
+    sofia.main.CausalLinks = timer.timed_causal_links()
+    try:
+        for _ in range(warmup):
+            for doc_id, annotations in corpus:
+                run_document(reader, timer, doc_id, annotations)
+        samples = {stage: [] for stage in stages}
+        num_docs, num_sentences, num_grounded, total = 0, 0, 0, 0.0
+        for _ in range(repeat):
+            for doc_id, annotations in corpus:
+                times, size, grounded = run_document(reader, timer, doc_id, annotations)
+                for stage in stages:
+                    samples[stage].append(times[stage] * 1000.0)
+                num_docs += 1
+                num_sentences += size
+                num_grounded += grounded
+                total += sum(times.values())
+    finally:
+        sofia.main.CausalLinks = CausalLinks
+    output_kb = output_memory_kb(reader, corpus)
+    results = {'documents': len(corpus), 'repeat': repeat,
+               'docs_per_sec': num_docs / total if total else 0.0,
+               'sentences_per_sec': num_sentences / total if total else 0.0,
+               'peak_rss_mb': peak_rss_mb(),
+               'output_kb_per_doc': output_kb,
+               'grounded_per_doc': num_grounded / num_docs if num_docs else 0.0,
+               'stages_ms': {}}
+    for stage in stages:
+        results['stages_ms'][stage] = {'p{}'.format(p): percentile(samples[stage], p) for p in percentiles}
+        results['stages_ms'][stage]['total'] = sum(samples[stage])
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of regressions of `results` with respect to `baseline`."""
+    regressions = []
+    for key in ['docs_per_sec', 'sentences_per_sec']:
+        if results[key] < baseline[key] / (1.0 + tolerance):
+            regressions.append('{}: {:.2f} < baseline {:.2f}'.format(key, results[key], baseline[key]))
+    if results['peak_rss_mb'] > baseline['peak_rss_mb'] * (1.0 + tolerance):
+        regressions.append('peak_rss_mb: {:.1f} > baseline {:.1f}'.format(results['peak_rss_mb'],
+                                                                          baseline['peak_rss_mb']))
+    if 'output_kb_per_doc' in baseline and \
+            results['output_kb_per_doc'] > baseline['output_kb_per_doc'] * (1.0 + tolerance):
+        regressions.append('output_kb_per_doc: {:.1f} > baseline {:.1f}'.format(results['output_kb_per_doc'],
+                                                                                baseline['output_kb_per_doc']))
+    for stage in stages:
+        for p in percentiles:
+            key = 'p{}'.format(p)
+            value, base = results['stages_ms'][stage][key], baseline['stages_ms'][stage][key]
+            # Sub-millisecond stages are dominated by timer noise.
+            if value > max(base * (1.0 + tolerance), base + 1.0):
+                regressions.append('{} {}: {:.3f}ms > baseline {:.3f}ms'.format(stage, key, value, base))
+    return regressions
+
+
+def report(results):
+    print('documents: {} x {}'.format(results['documents'], results['repeat']))
+    print('docs/sec: {:.2f}  sentences/sec: {:.2f}  peak RSS: {:.1f} MB  output: {:.1f} KB/doc'.format(
+        results['docs_per_sec'], results['sentences_per_sec'], results['peak_rss_mb'],
+        results['output_kb_per_doc']))
+    print('grounded entities and events per doc: {:.1f}'.format(results['grounded_per_doc']))
+    print('{:<16}'.format('stage (ms)') + ''.join('{:>10}'.format('p{}'.format(p)) for p in percentiles)
+          + '{:>12}'.format('total'))
+    for stage in stages:
+        row = results['stages_ms'][stage]
+        print('{:<16}'.format(stage) + ''.join('{:>10.3f}'.format(row['p{}'.format(p)]) for p in percentiles)
+              + '{:>12.1f}'.format(row['total']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SOFIA reading pipeline on saved annotations')
+    parser.add_argument('--corpus', type=str, default=os.path.join(bench_dir, 'corpus'))
+    parser.add_argument('--replay', type=str, default=None,
+                        help='ring directory of slow documents written by sofia.profiling; replaces --corpus')
+    parser.add_argument('--ontology', type=str, default='sofia')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--baseline', type=str, default=os.path.join(bench_dir, 'baseline.json'))
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown before a regression is reported')
+    parser.add_argument('--output', type=str, default=None, help='also write the results as JSON to this path')
+    args = parser.parse_args()
+
+    corpus = load_ring(args.replay) if args.replay is not None else load_corpus(args.corpus)
+    if not corpus:
+        sys.exit('no CoreNLP JSON annotations in {}'.format(args.replay or args.corpus))
+    results = run_benchmark(corpus, args.ontology, args.repeat, args.warmup)
+    report(results)
+    if not results['grounded_per_doc']:
+        sys.exit('no entity or event was grounded in the {} ontology: the benchmark would not measure '
+                 'the ontology grounding'.format(args.ontology))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('baseline written to {}'.format(args.baseline))
+        return
+    if not os.path.exists(args.baseline):
+        print('no baseline at {}; run with --update-baseline to create one'.format(args.baseline))
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('REGRESSIONS against {}:'.format(args.baseline))
+        for regression in regressions:
+            print('  ' + regression)
+        sys.exit(1)
+    print('no regressions against {}'.format(args.baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Compares the noun phrases of the fast annotation profile (dependency chunks) with the constituency parse.
+
+    python benchmarks/np_agreement.py                    # saved annotations: parse NPs vs dependency NPs
+    python benchmarks/np_agreement.py --annotate         # also re-annotate the texts with both profiles
+    python benchmarks/np_agreement.py --show             # print the phrases that differ
+
+The parse NPs are the reference. Agreement is reported on exact character spans and on phrase heads (same
+end offset). --annotate needs CORENLP_HOME and times CoreNLP with the 'full' and 'fast' annotators; the
+texts are rebuilt from the saved tokens.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import bench_dir, load_corpus, load_ring
+from sofia.corenlp_parse import DataExtractor
+from sofia.main import annotation_profiles
+
+
+def noun_phrases(annotations, source):
+    data_extractor = DataExtractor(annotations, noun_phrases=source)
+    return [[(np['start'], np['end'], np['text']) for np in sentence['NPs']]
+            for sentence in data_extractor.structuredData]
+
+
+def text_of(annotations):
+    text = ''
+    for sentence in annotations['sentences']:
+        for token in sentence['tokens']:
+            if not text:
+                text += token.get('before', '')
+            text += token['originalText'] + token.get('after', ' ')
+    return text
+
+
+class Agreement:
+    def __init__(self):
+        self.reference = 0
+        self.predicted = 0
+        self.exact = 0
+        self.heads = 0
+        self.differences = []
+
+    def add(self, doc_id, reference, predicted):
+        for ref_sentence, pred_sentence in zip(reference, predicted):
+            self.reference += len(ref_sentence)
+            self.predicted += len(pred_sentence)
+            ref_spans = {(start, end) for start, end, _ in ref_sentence}
+            ref_ends = {end for _, end, _ in ref_sentence}
+            self.exact += sum(1 for start, end, _ in pred_sentence if (start, end) in ref_spans)
+            self.heads += sum(1 for _, end, _ in pred_sentence if end in ref_ends)
+            if [i[:2] for i in ref_sentence] != [i[:2] for i in pred_sentence]:
+                self.differences.append((doc_id, [i[2] for i in ref_sentence], [i[2] for i in pred_sentence]))
+
+    def scores(self, matched):
+        precision = matched / self.predicted if self.predicted else 0.0
+        recall = matched / self.reference if self.reference else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return precision, recall, f1
+
+    def report(self, show):
+        print(f'noun phrases: {self.reference} parse, {self.predicted} dependency chunks')
+        for name, matched in [('exact span', self.exact), ('head', self.heads)]:
+            precision, recall, f1 = self.scores(matched)
+            print(f'  {name:<11} precision {precision:.3f}  recall {recall:.3f}  F1 {f1:.3f}')
+        print(f'  sentences with different phrases: {len(self.differences)}')
+        if show:
+            for doc_id, reference, predicted in self.differences:
+                print(f'  {doc_id}\n    parse:        {reference}\n    dependencies: {predicted}')
+
+
+def time_extractor(corpus, source, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, annotations in corpus:
+            DataExtractor(annotations, noun_phrases=source)
+    return (time.perf_counter() - start) / (repeat * len(corpus))
+
+
+def annotate(texts, profile):
+    import corenlp
+    with corenlp.CoreNLPClient(start_server=True, be_quiet=True, timeout=100000,
+                               annotators=annotation_profiles[profile]) as client:
+        client.annotate('hello world')
+        annotations, start = [], time.perf_counter()
+        for text in texts:
+            annotations.append(client.annotate(text, output_format='json'))
+        return annotations, (time.perf_counter() - start) / len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agreement of dependency noun phrase chunks with the parse')
+    parser.add_argument('--corpus', type=str, default=os.path.join(bench_dir, 'corpus'))
+    parser.add_argument('--replay', type=str, default=None, help='ring directory written by sofia.profiling')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--annotate', action='store_true', help='re-annotate the texts with both profiles')
+    parser.add_argument('--show', action='store_true', help='print the sentences whose phrases differ')
+    args = parser.parse_args()
+
+    corpus = load_ring(args.replay) if args.replay is not None else load_corpus(args.corpus)
+    corpus = [(doc_id, annotations) for doc_id, annotations in corpus
+              if all('parse' in sentence for sentence in annotations['sentences'])]
+    if not corpus:
+        sys.exit('no annotations with constituency parses found')
+
+    print(f'saved annotations ({len(corpus)} documents)')
+    agreement = Agreement()
+    for doc_id, annotations in corpus:
+        agreement.add(doc_id, noun_phrases(annotations, 'parse'), noun_phrases(annotations, 'dependencies'))
+    agreement.report(args.show)
+    parse_time = time_extractor(corpus, 'parse', args.repeat)
+    dependency_time = time_extractor(corpus, 'dependencies', args.repeat)
+    print(f'DataExtractor ms/doc: parse {parse_time * 1000:.3f}  dependencies {dependency_time * 1000:.3f}')
+
+    if args.annotate:
+        texts = [text_of(annotations) for _, annotations in corpus]
+        full, full_time = annotate(texts, 'full')
+        fast, fast_time = annotate(texts, 'fast')
+        print(f'\nCoreNLP s/doc: full {full_time:.3f}  fast {fast_time:.3f}  speed-up {full_time / fast_time:.2f}x')
+        agreement = Agreement()
+        for (doc_id, _), full_annotations, fast_annotations in zip(corpus, full, fast):
+            if len(full_annotations['sentences']) == len(fast_annotations['sentences']):
+                agreement.add(doc_id, noun_phrases(full_annotations, 'parse'),
+                              noun_phrases(fast_annotations, 'dependencies'))
+        print('fresh annotations, full profile parse vs fast profile chunks')
+        agreement.report(args.show)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Compares the size of the legacy and compact output formats (see sofia.output_format).
+
+    python benchmarks/output_size.py                 # the benchmark corpus
+    python benchmarks/output_size.py --corpus DIR    # another directory of CoreNLP JSON annotations
+
+Reads every document, writes both formats as JSON and reports their sizes, plain and gzipped. Also checks
+that converting the compact format back gives the legacy output, and that the ontology grounds some of the
+entities and events (the frames are a good part of the output).
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import bench_dir, load_corpus
+from sofia.corenlp_parse import DataExtractor
+from sofia.main import SOFIA
+from sofia.output_format import compact_output, legacy_output
+from sofia.semantic_units import output_records
+
+
+def sizes(data):
+    text = json.dumps(data).encode()
+    return len(text), len(gzip.compress(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Size of the legacy and compact output formats')
+    parser.add_argument('--corpus', type=str, default=os.path.join(bench_dir, 'corpus'))
+    parser.add_argument('--ontology', type=str, default='sofia')
+    args = parser.parse_args()
+
+    reader = SOFIA(args.ontology, start_server=False)
+    totals = {'legacy': [0, 0], 'compact': [0, 0]}
+    grounded = 0
+    for doc_id, annotations in load_corpus(args.corpus):
+        data_extractor = DataExtractor(annotations)
+        output = reader.get_output(data_extractor, doc_id)
+        grounded += sum(1 for result in output for unit in result.entities + result.events if unit.frame)
+        legacy = output_records(output)
+        compact = compact_output(output, doc_id)
+        if legacy_output(json.loads(json.dumps(compact))) != json.loads(json.dumps(legacy)):
+            sys.exit(f'{doc_id}: the compact output does not convert back to the legacy output')
+        for name, data in [('legacy', legacy), ('compact', compact)]:
+            plain, compressed = sizes(data)
+            totals[name][0] += plain
+            totals[name][1] += compressed
+    if not grounded:
+        sys.exit(f'no entity or event was grounded in the {args.ontology} ontology: the sizes would leave out '
+                 'the frames')
+    legacy_plain, legacy_gzip = totals['legacy']
+    for name, (plain, compressed) in totals.items():
+        print(f'{name:<8} {plain:>10} bytes ({legacy_plain / plain:.2f}x)  '
+              f'gzip {compressed:>9} bytes ({legacy_gzip / compressed:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
-from flask import Flask, request
+from flask import Flask, Response, request
 from sofia import SOFIA
+from sofia import instrumentation
 import json
 import redis
 from hashlib import sha1
@@ -127,6 +128,15 @@ def obtain_results():
     else:
         return 'Endpoint not supported.'
 
+@app.route('/metrics', methods=['GET'])
+@basic_auth.required
+def metrics():
+    '''
+    Returns the reading metrics (stage latencies, counters, errors) in the
+    Prometheus text format. Metrics are only recorded when SOFIA_METRICS is set.
+    '''
+    return Response(instrumentation.prometheus_text(), mimetype='text/plain; version=0.0.4')
+
 def gen_id(text):
     '''
     Generates a SHA1 as a SOFIA ID using the epoch timestamp
@@ -7,6 +7,8 @@ from nltk.tokenize import sent_tokenize
 import enchant
 
 from sofia import *
+from sofia import instrumentation
+from sofia.workers import WarmPool
 import requests
 from requests.auth import HTTPBasicAuth
 
@@ -88,7 +90,12 @@ def download_files(exp_path, credentials):
     return new_docs
 
 
-def upload_docs(experiment, doc_ids, credentials, ontology):
+def upload_docs(experiment, doc_ids, credentials, sofia):
+    for reader in sofia.readers:
+        upload_ontology_docs(experiment, doc_ids, credentials, reader)
+
+
+def upload_ontology_docs(experiment, doc_ids, credentials, reader):
     http_auth = None
     if credentials["password"] is not None:
         http_auth = HTTPBasicAuth("sofia", credentials["password"])
@@ -97,28 +104,46 @@ def upload_docs(experiment, doc_ids, credentials, ontology):
             "identity": "sofia",
             "version": "1.3",
             "document_id": doc_id,
-            "output_version": ontology.split('_')[1]
+            "output_version": reader.ontology_name.split('_')[1]
         }
-        output_filename = f'{os.getcwd()}/sofia/data/{experiment}_output/{doc_id}.json'
+        output_filename = f'{os.getcwd()}/{reader.output_file(experiment, doc_id)}'
+        # Read from the output store the run was configured with (--output_store)
+        document = reader.output_document(experiment, doc_id)
 
-        if os.path.exists(output_filename):
-            form_request = {"file": (output_filename, open(output_filename)),
-                            "metadata": (None, json.dumps(metadata), 'application/json')}
+        if document is None:
+            print(f'No {reader.output_store} output for doc {doc_id} in {reader.ontology_name}, not uploaded')
+            continue
+        form_request = {"file": (output_filename, document),
+                        "metadata": (None, json.dumps(metadata), 'application/json')}
 
+        with instrumentation.stage('upload'):
             response = requests.post(credentials["upload_api"], files=form_request, auth=http_auth)
 
-            if response.status_code == 201:
-                print(f'uploaded - {output_filename} for doc {doc_id}')
-            else:
-                print(f"Uploading of {doc_id} failed! Please re-try")
+        if response.status_code == 201:
+            print(f'uploaded - {output_filename} for doc {doc_id}')
+        else:
+            instrumentation.error('upload', f'http_{response.status_code}')
+            print(f"Uploading of {doc_id} failed! Please re-try")
+
+
+def read_docs(text_path, doc_ids):
+    text_files = set(os.listdir(text_path))
+    for doc_id in doc_ids:
+        if doc_id in text_files:
+            with open(text_path+'/'+doc_id) as f:
+                yield doc_id, f.read()
 
 
-def run_sofia_online(credentials, ontology, experiment, version, docs_file, mode):
+def run_sofia_online(credentials, ontologies, experiment, version, docs_file, mode, workers=1, annotation_profile=None,
+                     output_format=None, output_store=None):
     sofia_path = os.getcwd()
     exp_path = f'{sofia_path}/sofia/data/{experiment}'
     text_path = f'{exp_path}/text'
     #ann_path = f'{exp_path}/annotations'
-    if docs_file == None:
+    if docs_file == None and mode == 'reground':
+        # Every document read before
+        doc_ids = [i[:-len('.json')] for i in os.listdir(f'{exp_path}/annotations') if i.endswith('.json')]
+    elif docs_file == None:
         print("Downloading CDRS...")
         doc_ids = download_files(exp_path, credentials)
     else:
@@ -128,34 +153,68 @@ def run_sofia_online(credentials, ontology, experiment, version, docs_file, mode
         return "completed downloading"
     elif mode=='upload':
         print("Uploading docs to DART.....")
-        upload_docs(experiment, doc_ids, credentials, ontology)
+        sofia = SOFIA(ontologies, start_server=False, output_format=output_format, output_store=output_store)
+        upload_docs(experiment, doc_ids, credentials, sofia)
         return "completed uploading"
 
-    sofia = SOFIA(ontology)
+    elif mode=='reground':
+        # The documents were read before: reapply the (new) ontology to their saved structured data.
+        sofia = SOFIA(ontologies, start_server=False, output_format=output_format, output_store=output_store)
+        print(f"Regrounding docs in {', '.join(ontologies)}...")
+        if workers > 1:
+            with WarmPool(sofia, workers) as pool:
+                for doc_id, output_file in pool.reground(doc_ids, experiment):
+                    print(f'Regrounded {output_file}')
+        else:
+            for doc_id in doc_ids:
+                output_file= sofia.reground(doc_id, experiment)
+                print(f'Regrounded {output_file}')
+        if sofia.memo is not None:
+            print(sofia.memo.report())
+        print("Uploading docs to DART.....")
+        upload_docs(experiment, doc_ids, credentials, sofia)
+        return "completed uploading"
+
+    sofia = SOFIA(ontologies, annotation_profile=annotation_profile, output_format=output_format,
+                  output_store=output_store)
     print("Preprocessing files with corenlp...")
     print("Running Sofia...")
-    for doc_id in doc_ids:
-        #if doc != '.DS_Store':
-        if doc_id in os.listdir(text_path):
-            with open(text_path+'/'+doc_id) as f:
-                text = f.read()
+    if workers > 1:
+        with WarmPool(sofia, workers) as pool:
+            for doc_id, output_file in pool.read(read_docs(text_path, doc_ids), experiment, save=True):
+                print(f'Read {output_file}')
+    else:
+        for doc_id, text in read_docs(text_path, doc_ids):
             output_file= sofia.get_online_output(text, doc_id, experiment, save=True)
             #f'{ann_path}/{doc_id}_{version}',
-        print(f'Read {output_file}')
+            print(f'Read {output_file}')
+    if sofia.memo is not None:
+        print(sofia.memo.report())
     if mode == 'read':
         return "completed reading"
 
     print("Uploading docs to DART.....")
-    upload_docs(experiment, doc_ids, credentials, ontology)
+    upload_docs(experiment, doc_ids, credentials, sofia)
     return "completed uploading"
 
 def main():
     parser = argparse.ArgumentParser(description='Augment Data with Wikipedia Links')
     parser.add_argument('--experiment', type=str, default='aug2021')
     parser.add_argument('--version', type=str, default='v1')
-    parser.add_argument('--ontology', type=str, default='compositional_2.3')
-    parser.add_argument('--mode', type=str, help='Options are: download,read,all', default= 'all')
+    parser.add_argument('--ontology', type=str, default='compositional_2.3',
+                        help='Ontology, or comma separated ontologies read in one pass (one output each)')
+    parser.add_argument('--mode', type=str, help='Options are: download,read,reground,upload,all', default= 'all')
     parser.add_argument('--docs_file', type=str, default= None)
+    parser.add_argument('--annotation_profile', type=str, default= None,
+                        help='CoreNLP annotators, options are: full, fast (no constituency parser). '
+                             'Defaults to $SOFIA_ANNOTATION_PROFILE or full')
+    parser.add_argument('--output_format', type=str, default= None,
+                        help='Options are: legacy, compact (see sofia.output_format). '
+                             'Defaults to $SOFIA_OUTPUT_FORMAT or legacy')
+    parser.add_argument('--output_store', type=str, default= None,
+                        help='Options are: files (one JSON file per document), segments (see sofia.output_store). '
+                             'Defaults to $SOFIA_OUTPUT_STORE or files')
+    parser.add_argument('--workers', type=int, default= 1, help='Number of reading processes forked from a warm parent')
     parser.add_argument('--upload_api', type=str, default= None)
     parser.add_argument('--cdr_api', type=str, default= None)
     parser.add_argument('--password', type=str, default= None)
@@ -181,7 +240,9 @@ def main():
         #os.system('docker run --env PROGRAM_ARGS=wm-sasl-example -it -v {}:/opt/app/data '
          #         'python-kafka-consumer-local:latest'.format(kafka_path))
 
-    completed= run_sofia_online(credentials, args.ontology, experiment, args.version, args.docs_file, args.mode)
+    completed= run_sofia_online(credentials, args.ontology.split(','), experiment, args.version, args.docs_file, args.mode,
+                                args.workers, args.annotation_profile, args.output_format, args.output_store)
+    instrumentation.flush()
     print(completed)
 
 
@@ -14,6 +14,7 @@ from requests.auth import HTTPBasicAuth
 import enchant
 
 from sofia import *
+from sofia import instrumentation
 
 lang_encoding_dict = enchant.Dict("en_US")
 
@@ -100,7 +101,7 @@ def get_cdr_text(doc_id, cdr_api, sofia_user, sofia_pass):
         return None
 
 
-def upload_sofia_output(doc_id, output_filename, upload_api, sofia_user, sofia_pass, ontology_version):
+def upload_sofia_output(doc_id, output_filename, document, upload_api, sofia_user, sofia_pass, ontology_version):
     metadata = {
         "identity": "sofia",
         "version": "1.3",
@@ -108,17 +109,19 @@ def upload_sofia_output(doc_id, output_filename, upload_api, sofia_user, sofia_p
         "output_version": ontology_version #Ontology version, modify 2.2?
     }
 
-    form_request = {"file": (output_filename, open(output_filename)), "metadata": (None, json.dumps(metadata), 'application/json')}
+    form_request = {"file": (output_filename, document), "metadata": (None, json.dumps(metadata), 'application/json')}
 
     http_auth = None
     if sofia_user is not None and sofia_pass is not None:
         http_auth = HTTPBasicAuth(sofia_user, sofia_pass)
 
-    response = requests.post(upload_api, files=form_request, auth=http_auth)
+    with instrumentation.stage('upload'):
+        response = requests.post(upload_api, files=form_request, auth=http_auth)
 
     if response.status_code == 201:
         print( f'uploaded - {output_filename} for doc {doc_id}')
     else:
+        instrumentation.error('upload', f'http_{response.status_code}')
         print(f"Uploading of {doc_id} failed! Please re-try")
 
 
@@ -132,8 +135,8 @@ def run_sofia_stream(kafka_broker,
                      ontology,
                      experiment,
                      version):
-    sofia = SOFIA(ontology)
-    ontology_version = ontology.split('_')[1]
+    # ONTOLOGY may list several comma separated ontologies: one output (and upload) per ontology
+    sofia = SOFIA(ontology.split(','))
     app = create_kafka_app(kafka_broker, sofia_user, sofia_pass, kafka_auto_offset_reset, kafka_enable_auto_commit )
     dart_update_topic = app.topic("dart.cdr.streaming.updates", key_type=str, value_type=str)
 
@@ -146,7 +149,12 @@ def run_sofia_stream(kafka_broker,
             if extracted_text is not None:
                 output = sofia.get_online_output(extracted_text, doc_id, experiment=experiment, save= False)
                 if output is not None:
-                    upload_sofia_output(doc_id, output, upload_api, sofia_user, sofia_pass, ontology_version)
+                    for reader in sofia.readers:
+                        # With SOFIA_OUTPUT_STORE=segments the output is read back from the store
+                        upload_sofia_output(doc_id, reader.output_file(experiment, doc_id),
+                                            reader.output_document(experiment, doc_id), upload_api,
+                                            sofia_user, sofia_pass, reader.ontology_name.split('_')[1])
+                instrumentation.flush()
 
     app.main()
 
@@ -1 +1,10 @@
-from sofia.main import SOFIA
\ No newline at end of file
+# SOFIA is imported on first use, so that `import sofia` (and tools that only need a submodule) do not
+# pay for the NLP dependencies.
+__all__ = ['SOFIA']
+
+
+def __getattr__(name):
+    if name == 'SOFIA':
+        from sofia.main import SOFIA
+        return SOFIA
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,10 +1,15 @@
+from bisect import bisect_right
 
-verb_tags=["VB", "VBP", "VBD", "VBZ", "VBN", "VBG"]
+from sofia.causal_triggers import TriggerLexicon
+from sofia.semantic_units import CausalRelation
+
+report_frames = {'Communication', 'Text_creation', 'Statement', 'Warning', 'Indicating', 'Cogitation'}
 
 class CausalLinks:
 
-    def __init__(self, events, event_local_index, events2, entities, entity_local_index, sentence, lemmas, pos,
-                 event_scores, entity_scores):
+    def __init__(self, events, events2, entities, sentence, lemmas, pos, lexicon=None):
+        """`events` and `entities` map spans to numbered (and scored) Event and Entity objects; the
+        property spans `events2` are moved out of `events`."""
         self.sentence= sentence
         self.tokens= self.sentence.split(' ')
         self.events = events
@@ -14,88 +19,97 @@ class CausalLinks:
             event = events[span]
             del self.events[span]
             self.events2[span] = event
+        self.lexicon= lexicon if lexicon is not None else TriggerLexicon.load()
         self.triggers= self.detect_causal_triggers(lemmas, pos)
-        self.bounds= self.set_bounds()
-        self.event_index= event_local_index
+        self.bounds, self.bound_index= self.set_bounds()
         self.entities= entities
-        self.entity_index= entity_local_index
-        self.report_frames = ['Communication', 'Text_creation', 'Statement', 'Warning', 'Indicating', 'Cogitation']
-        self.event_scores= event_scores
-        self.entity_scores= entity_scores
+        self.report_frames = report_frames
+        self.gaps= self.bucket_events()
 
 
     def format(self, keys):
         event_index=""
         event_text=""
         bestScore = -1.0
-        for span in self.event_index.keys():
+        keys = set(keys)
+        for span in self.events.keys():
             if span in keys:
-                index= self.event_index[span]
-                if self.event_scores[index] > bestScore:
-                    bestScore = self.event_scores[index]
-                    event_index = index
-                    event_text = self.events[span]['trigger']
+                event= self.events[span]
+                if event.score > bestScore:
+                    bestScore = event.score
+                    event_index = event.id
+                    event_text = event.trigger
         return event_index, event_text
 
     def detect_causal_triggers(self, lemmas, pos):
-        triggers=[]
         if len(self.events)<2:
             return []
-        # Hard Triggers
-        causal={'CauseEffect':['impact', 'affect', 'drive', 'lead', 'result', 'cause', 'so', 'hence', 'consequence'],
-                'EffectCause':['because', 'due', 'since', 'as']}
-        ##Add constraint that preventive triggers must also be verbs???
-        # What about correlation triggers?
-        ## Soft triggers
-        preventive = ['prevent', 'limit', 'restrict', 'constrain', 'block', 'bind', 'regulate']
-        quantitative_triggers = ['increase', 'decrease', 'reduce', 'boost', 'drop']
-        # Hard or soft?
-        correlation = ['relate', 'influence', 'correlate']
-        for index in range(len(lemmas)):
-            lemma= lemmas[index]
-            if lemma in causal['CauseEffect']:
-                if 'by' in lemmas[index+1:]:
-                    triggers.append((index, "right", 'CausalRelation'))
-                else:
-                    triggers.append((index, "left", 'CausalRelation'))
-            elif lemma in causal['EffectCause']:
-                triggers.append((index, 'right', 'CausalRelation'))
-            elif lemma in preventive:
-                if pos[index] in verb_tags:
-                    if 'by' in lemmas[index + 1:]:
-                        triggers.append((index, "right", 'PreventRelation'))
-                    else:
-                        triggers.append((index, "left", 'PreventRelation'))
-            elif lemma in correlation:
-                triggers.append((index, "left", 'CorrelateRelation'))
-            elif lemma in quantitative_triggers:
-                triggers.append((index, "left", 'Increase/Decrease'))
+        triggers= self.lexicon.find_triggers(lemmas, pos)
         for span in self.events2:
-            index=self.events2[span]['index']
-            triggers.append((index, "left", "Catalyst/Mitigator/Precondition"))
+            index=self.events2[span].index
+            triggers.append((index, "left", "Catalyst/Mitigator/Precondition", 1))
         return triggers
 
     def set_bounds(self):
+        """Sorts the trigger positions; a multi-word trigger contributes both its first and last token, so
+        the tokens inside the trigger are never cause/effect candidates."""
         bounds={}
         bound_index = [-1, len(self.tokens)] ###Changed that
         for trigger in self.triggers:
-            index= trigger[0]
+            index, length= trigger[0], trigger[3]
             bound_index.append(index)
-            bounds[index]= {"trigger": trigger}
+            if length > 1:
+                bound_index.append(index + length - 1)
+            bounds[index]= {"trigger": trigger, 'curr': index, 'end': index + length - 1}
         bound_index.sort()
-        for i in range(1, len(bound_index)-1):
-            bound= bound_index[i]
-            prev= bound_index[i-1]
-            next= bound_index[i+1]
-            bounds[bound].update({'curr': bound, "prev": prev, "next": next})
-        return bounds
+        for index in bounds:
+            bound= bounds[index]
+            left= bisect_right(bound_index, index) - 1
+            right= bisect_right(bound_index, bound['end']) - 1
+            bound.update({"prev": bound_index[left-1], "next": bound_index[right+1], 'left_gap': left-1,
+                          'right_gap': right})
+        return bounds, bound_index
+
+    def event_position(self, event):
+        if event.start_index is not None:
+            return event.start_index
+        if event.index is not None:
+            return event.index
+        event_text = event.trigger.split(' ')[0]
+        if event_text in self.tokens:
+            return self.tokens.index(event_text)
+        return None
+
+    def bucket_events(self):
+        """Sorts the candidate events by token position and buckets them into the gaps between triggers.
+
+        gaps[i] holds the events strictly between bound_index[i] and bound_index[i+1], so the events on the
+        left and right of a trigger are the two gaps around its position.
+        """
+        positions = []
+        for span in self.events.keys():
+            event = self.events[span]
+            if len(self.report_frames.intersection(event.frame_FN)) > 0:
+                continue
+            index = self.event_position(event)
+            if index is not None:
+                positions.append((index, span))
+        positions.sort(key=lambda item: item[0])
+        gaps = [[] for _ in range(len(self.bound_index) - 1)]
+        gap = 0
+        for index, span in positions:
+            while gap < len(gaps) - 1 and self.bound_index[gap + 1] <= index:
+                gap += 1
+            if self.bound_index[gap] < index < self.bound_index[gap + 1]:
+                gaps[gap].append(span)
+        return gaps
 
     def get_causal_nodes(self, entity_replacement=False):
         ##Use also Entities as potential nodes, in case that we cannot locate an Event as cause/effect
         causal_links=[]
         for b in self.bounds.keys():
             bound= self.bounds[b]
-            trigger, direction, causal_type= bound['trigger']
+            trigger, direction, causal_type, length= bound['trigger']
             cause, effect= self.locate_events(bound, direction) ##Left is default: cause, relation, effect
             cause_index, cause_text = self.format(cause)
             effect_index, effect_text= self.format(effect)
@@ -107,27 +121,14 @@ class CausalLinks:
                     cause, effect = self.locate_events(bound, direction)
                     cause_index, cause_text = self.format(cause)
             if cause_index!= '' and effect_index!= '':
-                trigger_text= self.tokens[trigger]
-                causal_links.append({'trigger': trigger_text, 'cause': (cause_index, cause_text),
-                                  'effect': (effect_index, effect_text), 'type': causal_type})
+                trigger_text= ' '.join(self.tokens[trigger:trigger+length])
+                causal_links.append(CausalRelation(trigger_text, causal_type, cause_index, cause_text, effect_index,
+                                                   effect_text))
         return causal_links
 
     def locate_events(self, bound, direction):
-        keys = self.events.keys()
-        left_events=[]
-        right_events=[]
-        for span in keys:
-            event = self.events[span]
-            #index = self.sentence.index(event['trigger'])
-            event_text= event['trigger'].split(' ')[0]
-            index= self.tokens.index(event_text)
-            if len(set(event['frame_FN']).intersection(set(self.report_frames))) >0:
-                continue
-            if index>bound['prev'] and index<bound['next']:
-                if index<bound['curr']:
-                    left_events.append(span)
-                elif index>bound['curr']:
-                    right_events.append(span)
+        left_events = self.gaps[bound['left_gap']]
+        right_events = self.gaps[bound['right_gap']]
         if direction=='left':
             return left_events, right_events
-        return right_events, left_events
\ No newline at end of file
+        return right_events, left_events
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+
+verb_tags=["VB", "VBP", "VBD", "VBZ", "VBN", "VBG"]
+default_lexicon = os.path.dirname(os.path.abspath(__file__)) + '/data/causal_triggers.json'
+
+
+class TriggerLexicon:
+    """Causal trigger lexicon compiled into a token-level trie over lemmas.
+
+    Each trigger entry has a space separated lemma sequence, the default direction ("left": cause on the
+    left, "right": cause on the right), an optional lookahead cue that flips the direction when it occurs
+    later in the sentence (e.g. "caused by"), an optional verb-only constraint and the relation type.
+    Lexicons are loaded once per path through `TriggerLexicon.load`. `digest` is a hash of the lexicon
+    file, which keys the sentence memo (see sofia.memo) on its content rather than its path.
+    """
+    _loaded = {}
+
+    def __init__(self, data, digest=None):
+        self.digest = digest
+        self.cue_bits = {}
+        for cue in data.get('lookahead_cues', []):
+            self.cue_bits[cue] = 1 << len(self.cue_bits)
+        self.trie = {}
+        for entry in data['triggers']:
+            node = self.trie
+            for lemma in entry['trigger'].split(' '):
+                node = node.setdefault(lemma, {})
+            if None in node:
+                continue
+            flip = self.cue_bits.get(entry.get('flip_on'), 0)
+            node[None] = (entry['direction'], flip, entry.get('verb_only', False), entry['type'])
+
+    @classmethod
+    def load(cls, path=None):
+        if path is None:
+            path = default_lexicon
+        if path not in cls._loaded:
+            with open(path, 'rb') as f:
+                content = f.read()
+            cls._loaded[path] = cls(json.loads(content), hashlib.blake2b(content, digest_size=16).hexdigest())
+        return cls._loaded[path]
+
+    def lookahead(self, lemmas):
+        """suffix[i] has the bit of every lookahead cue that occurs in lemmas[i+1:]."""
+        suffix = [0] * len(lemmas)
+        mask = 0
+        for index in range(len(lemmas) - 1, -1, -1):
+            suffix[index] = mask
+            mask |= self.cue_bits.get(lemmas[index], 0)
+        return suffix
+
+    def match(self, lemmas, start):
+        """Returns the rule and length of the longest trigger starting at `start`, or (None, 0)."""
+        node = self.trie
+        rule, length = None, 0
+        for index in range(start, len(lemmas)):
+            node = node.get(lemmas[index])
+            if node is None:
+                break
+            if None in node:
+                rule, length = node[None], index - start + 1
+        return rule, length
+
+    def find_triggers(self, lemmas, pos):
+        """Returns (index, direction, relation type, length) for every trigger in a sentence."""
+        triggers = []
+        suffix = self.lookahead(lemmas)
+        index = 0
+        while index < len(lemmas):
+            rule, length = self.match(lemmas, index)
+            if rule is None:
+                index += 1
+                continue
+            direction, flip, verb_only, relation_type = rule
+            end = index + length - 1
+            if not verb_only or pos[index] in verb_tags:
+                if suffix[end] & flip:
+                    direction = 'right' if direction == 'left' else 'left'
+                triggers.append((index, direction, relation_type, length))
+            index += length
+        return triggers
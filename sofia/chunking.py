@@ -0,0 +1,33 @@
+"""Splits documents into size-bounded chunks at paragraph and sentence boundaries and annotates them
+concurrently, so a large document is not one long request on one CoreNLP server thread."""
+from concurrent.futures import ThreadPoolExecutor
+
+
+def chunk_sentences(text, bounds, max_chars):
+    """Groups consecutive sentences [(begin, end)] of `text` into [(begin, end)] chunks of at most
+    `max_chars` characters (a longer sentence is a chunk of its own). A chunk is closed at the last
+    paragraph break (a blank line) inside it when that keeps at least half of it, else at the last sentence."""
+    chunks = []
+    current = []
+    for begin, end in bounds:
+        while current and end - current[0][0] > max_chars:
+            cut = len(current)
+            for i in range(len(current) - 1, 0, -1):
+                if '\n\n' in text[current[i - 1][1]:current[i][0]]:
+                    if current[i - 1][1] - current[0][0] >= max_chars // 2:
+                        cut = i
+                    break
+            chunks.append((current[0][0], current[cut - 1][1]))
+            current = current[cut:]
+        current.append((begin, end))
+    if current:
+        chunks.append((current[0][0], current[-1][1]))
+    return chunks
+
+
+def annotate_concurrently(annotate, pieces, workers):
+    """Calls `annotate(*piece)` for every piece on `workers` threads; returns the results in piece order."""
+    if workers <= 1 or len(pieces) <= 1:
+        return [annotate(*piece) for piece in pieces]
+    with ThreadPoolExecutor(max_workers=min(workers, len(pieces))) as executor:
+        return list(executor.map(lambda piece: annotate(*piece), pieces))
@@ -2,28 +2,44 @@ import json
 from nltk.wsd import lesk
 from nltk.corpus import wordnet
 from nltk.corpus import wordnet_ic
+from nltk.corpus.reader.wordnet import WordNetError
 from nltk.corpus import framenet as fn
 import os
-from sklearn.cluster import KMeans
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import numpy as np
+from scipy import sparse
+from sofia.embeddings import EmbeddingStore
 from sofia.frames_FN_mapping import FrameNetFrames
+from sofia.wsd import LeskDisambiguator
 
 verb_tags=["VB", "VBP", "VBD", "VBZ", "VBN"] #VBN and VBG maybe?
 noun_tags= ["NN", "NNS", "NNP", "NNPS", "JJ"]
 project= '/Users/evangeliaspiliopoulou/Desktop/WorldModelers/South_Sudan_Famine'
 
 
-def extract_Ngrams(file_name):
-    print(file_name)
-    jsonfile = open(project+ '/outputStanford/'+ file_name, 'r')
-    jsonstr = jsonfile.read()
-    data = json.loads(jsonstr)
-    jsonfile.close()
-    nominal_bigrams=[]
-    verbs=[]
-    nouns=[]
-    verb_synsets=[]
-    noun_synsets=[]
+disambiguator= None
+
+def get_disambiguator():
+    global disambiguator
+    if disambiguator is None:
+        disambiguator= LeskDisambiguator()
+    return disambiguator
+
+def extract_Ngrams(file_name, ann_path=None):
+    """Counts nominal bigrams, verb and noun lemmas and their Lesk synsets in one annotation file."""
+    if ann_path is None:
+        ann_path= project+ '/outputStanford/'
+    with open(ann_path+ file_name, 'r') as jsonfile:
+        data = json.load(jsonfile)
+    wsd= get_disambiguator()
+    nominal_bigrams=Counter()
+    verbs=Counter()
+    nouns=Counter()
+    verb_synsets=Counter()
+    noun_synsets=Counter()
     for i in range(len(data['sentences'])):
         words= []
         sentence_tokens= data['sentences'][i]['tokens']
@@ -31,6 +47,7 @@ def extract_Ngrams(file_name):
             word = sentence_tokens[index]['word']
             if all(ord(c) < 128 for c in word):
                 words.append(str(word))
+        context= frozenset(words)
         lemma_prev= ""
         pos_prev= ""
         for index in range(len(sentence_tokens)):
@@ -40,7 +57,7 @@ def extract_Ngrams(file_name):
             if all(ord(c) < 128 for c in lemma):
                 if pos in noun_tags:
                     if pos_prev in noun_tags:
-                        nominal_bigrams.append((lemma_prev, lemma))
+                        nominal_bigrams[lemma_prev+ ' '+ lemma]+= 1
                         lemma_prev= lemma
                     else:
                         lemma_prev = lemma
@@ -49,14 +66,17 @@ def extract_Ngrams(file_name):
                     lemma_prev=""
                     pos_prev= ""
                 if pos in verb_tags:
-                    synset= lesk(words, lemma, 'v')
-                    verb_synsets.append(synset)
-                    verbs.append(lemma)
+                    synset= wsd.best_sense(context, lemma, 'v')
+                    if synset!= None:
+                        verb_synsets[synset.name()]+= 1
+                    verbs[lemma]+= 1
                 elif pos in noun_tags[:-1]:
-                    synset = lesk(words, lemma, 'n')
-                    noun_synsets.append(synset)
-                    nouns.append(lemma)
-    return nominal_bigrams, verbs, nouns, verb_synsets, noun_synsets
+                    synset = wsd.best_sense(context, lemma, 'n')
+                    if synset!= None:
+                        noun_synsets[synset.name()]+= 1
+                    nouns[lemma]+= 1
+    return {'bigrams': nominal_bigrams, 'verbs': verbs, 'nouns': nouns, 'verb_synsets': verb_synsets,
+            'noun_synsets': noun_synsets}
 
 def get_related_verbs(file_name):
     jsonfile = open(project+ '/outputStanford/'+ file_name+ '.json', 'r')
@@ -107,43 +127,54 @@ def get_related_verbs(file_name):
     return related_verbs
 
 
-def order_list(list, file_name, using_synsets= False):
-    dic={}
-    for item in list:
-        if item!= None:
-            if item not in dic.keys():
-                dic[item]= 0
-            dic[item]+=1
-    file = open(project+'/OntologyFiles/'+file_name, 'w')
-    for key, value in sorted(dic.items(), key=lambda k: k[1], reverse=True):
-        if using_synsets:
-            definition= str(key.definition())
-            lemma= str(key.name())
-            file.write(lemma + '\t' + str(value)+'\t'+ definition)
-        else:
-            file.write(str(key) + '\t' + str(value))
-        file.write('\n')
-    file.close()
+def order_list(counts, file_name, using_synsets= False, output_path= None):
+    """Writes counts sorted by frequency, one `item<TAB>count` line per item (plus the definition for synsets)."""
+    if output_path is None:
+        output_path= project+'/OntologyFiles/'
+    with open(output_path+file_name, 'w') as file:
+        for key, value in sorted(counts.items(), key=lambda k: (-k[1], k[0])):
+            if using_synsets:
+                definition= str(wordnet.synset(key).definition())
+                file.write(key + '\t' + str(value)+'\t'+ definition)
+            else:
+                file.write(key + '\t' + str(value))
+            file.write('\n')
     print("Done writing {}".format(file_name))
 
-def write_NGrams(file_list):
-    bigrams=[]
-    verb_list=[]
-    noun_list=[]
-    verb_synset_list=[]
-    noun_synset_list=[]
-    for file_name in file_list:
-        bigram, verb, noun, verb_synset, noun_synset= extract_Ngrams(file_name)
-        bigrams+= bigram
-        verb_list+= verb
-        noun_list+= noun
-        verb_synset_list+= verb_synset
-        noun_synset_list+= noun_synset
-    order_list(bigrams, "BigramCount.txt")
-    order_list(verb_list, "VerbCount.txt")
-    order_list(noun_list, "NounCount.txt")
-    order_list(verb_synset_list, "vSynsets.txt", using_synsets= True)
-    order_list(noun_synset_list, "nSynsets.txt", using_synsets= True)
+def load_statistics(state_path):
+    if state_path is None or not os.path.exists(state_path):
+        return [], {name: Counter() for name in statistics_files}
+    with open(state_path) as f:
+        state= json.load(f)
+    return state['files'], {name: Counter(state['counts'][name]) for name in statistics_files}
+
+def save_statistics(state_path, files, counts):
+    with open(state_path+ '.tmp', 'w') as f:
+        json.dump({'files': sorted(files), 'counts': counts}, f)
+    os.replace(state_path+ '.tmp', state_path)
+
+statistics_files= {'bigrams': ("BigramCount.txt", False), 'verbs': ("VerbCount.txt", False),
+                   'nouns': ("NounCount.txt", False), 'verb_synsets': ("vSynsets.txt", True),
+                   'noun_synsets': ("nSynsets.txt", True)}
+
+def write_NGrams(file_list, ann_path=None, output_path=None, state_path=None, workers=None):
+    """Counts n-grams and synsets over annotation files across a process pool and writes the sorted counts.
+
+    Per-file counters are merged as they arrive. With `state_path`, the merged counts and the processed
+    files are kept on disk, so a later run only processes files that were not counted before.
+    """
+    done, counts= load_statistics(state_path)
+    new_files= sorted(set(file_list)- set(done))
+    with Pool(workers) as pool:
+        for file_counts in pool.imap_unordered(partial(extract_Ngrams, ann_path=ann_path), new_files):
+            for name in statistics_files:
+                counts[name].update(file_counts[name])
+    if state_path is not None:
+        save_statistics(state_path, set(done)| set(new_files), counts)
+    for name in statistics_files:
+        file_name, using_synsets= statistics_files[name]
+        order_list(counts[name], file_name, using_synsets= using_synsets, output_path= output_path)
+    return counts
 
 #fileList=['2017_South_Sudan_famine', 'Stunted_growth', 'Paragraphs_SSudan', 'History_Sudan_Aid', 'Monitoring_Humanitarian_Aid', 'Thesis_Sudan', 'Food_security']
 
@@ -159,130 +190,160 @@ def clean_text(text_init):
             text+= str(letter)
     return text
 
-def get_synonyms(synset):
-    semcor = wordnet_ic.ic('ic-semcor.dat')
-    synonyms=[]
+information_content= None
+
+def get_information_content():
+    """The SemCor information content, loaded once per process."""
+    global information_content
+    if information_content is None:
+        information_content = wordnet_ic.ic('ic-semcor.dat')
+    return information_content
+
+def get_neighbourhood(synset, depth=2):
+    """Synsets of the same POS reachable by going up to `depth` hypernym steps and back down as many
+    hyponym steps, i.e. the synset's ancestors, siblings and cousins within the bound."""
+    ancestors= {synset}
+    frontier= [synset]
+    for _ in range(depth):
+        frontier= [parent for node in frontier for parent in node.hypernyms()+ node.instance_hypernyms()]
+        ancestors.update(frontier)
+    neighbourhood= set(ancestors)
+    frontier= list(ancestors)
+    for _ in range(depth):
+        frontier= [child for node in frontier for child in node.hyponyms()+ node.instance_hyponyms()
+                   if child not in neighbourhood]
+        neighbourhood.update(frontier)
+    return [node for node in neighbourhood if node.pos()== synset.pos()]
+
+def score_synonyms(synset, threshold=0.2, top_k=20, depth=2):
+    """(name, jcn similarity) of the top_k synsets in the neighbourhood of `synset` above threshold."""
+    semcor = get_information_content()
     w1 = wordnet.synset(synset)
-    for w2 in wordnet.all_synsets():
+    scored=[]
+    for w2 in get_neighbourhood(w1, depth):
         try:
             sim = w1.jcn_similarity(w2, semcor)
-        except:
-            sim= 0.0
-        if sim>0.2:
-            synonyms.append(w2)
-    return synonyms
-
-
-def set_embeddings(embedding_file= 'embeddings.txt'):
-    f=open( '/Users/evangeliaspiliopoulou/Desktop/WorldModelers/' + embedding_file)
-    text= f.read()
-    f.close()
-    embeddings={}
-    terms= text.split('\n')
-    for term in terms:
-        vector= term.split(' ')
-        word= vector[0]
-        vector= vector[1:]
-        vector = [float(i) for i in vector]
-        embeddings[word]= np.array(vector)
-    return embeddings
+        except WordNetError:
+            continue
+        if sim>threshold:
+            scored.append((w2.name(), sim))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:top_k]
+
+def get_synonyms(synset, threshold=0.2, top_k=20, depth=2):
+    return [wordnet.synset(name) for name, sim in score_synonyms(synset, threshold, top_k, depth)]
+
+def expand_synonyms(seeds, cache_path=None, workers=None, threshold=0.2, top_k=20, depth=2):
+    """Synonym names for many seed synsets, scored across a process pool.
+
+    Results are kept in a JSON cache on disk (keyed by seed and parameters), so only new seeds are scored.
+    """
+    cache={}
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache= json.load(f)
+    key= lambda seed: f'{seed}|{threshold}|{top_k}|{depth}'
+    missing= [seed for seed in set(seeds) if key(seed) not in cache]
+    if len(missing)> 0:
+        score= partial(score_synonyms, threshold=threshold, top_k=top_k, depth=depth)
+        with Pool(workers, initializer=get_information_content) as pool:
+            for seed, scored in zip(missing, pool.map(score, missing)):
+                cache[key(seed)]= scored
+        if cache_path is not None:
+            with open(cache_path+ '.tmp', 'w') as f:
+                json.dump(cache, f)
+            os.replace(cache_path+ '.tmp', cache_path)
+    return {seed: [name for name, sim in cache[key(seed)]] for seed in seeds}
+
+
+def set_embeddings(embedding_file= 'embeddings.txt', embedding_dir= None):
+    """Loads the word embeddings, converting the text file to a memory-mapped store on first use."""
+    if embedding_dir is None:
+        embedding_dir= os.getenv('SOFIA_EMBEDDINGS_DIR', os.getcwd())
+    return EmbeddingStore.load(os.path.join(embedding_dir, embedding_file))
 
 def get_phrase_embeddings(phrase, embeddings):
-    words= filter(lambda a: a!='', phrase.split(' '))
-    vector = np.zeros(50)
-    word_number=0
-    for word in words:
-        if word in embeddings:
-            vector+= embeddings[word]
-            word_number+=1
-    if word_number> 0:
-        vector= vector/word_number
-    return vector
+    return embeddings.phrase_embeddings([phrase])[0]
+
+def get_phrase_matrix(phrases, embeddings):
+    """(phrases x dim) matrix of averaged phrase embeddings."""
+    return embeddings.phrase_embeddings(phrases)
 
 def set_FN_embeddings():
-    embeddings={}
+    """Column of every FrameNet frame in the sparse frame features."""
     frames= fn.frames()
-    vector= np.zeros(len(frames))
+    frame_index= {}
     for i in range(len(frames)):
-        name= frames[i].name
-        vector_i= np.copy(vector)
-        vector_i[i]= 1.0
-        embeddings[name]= vector_i
-    return embeddings, len(frames)
-
-def get_FN_embeddings(frame_list, fn_embeddings, dim):
-    # frames = fn.frames()
-    vector = np.zeros(dim)
-    if len(frame_list)==0:
-        return vector
-    for frame in frame_list:
-        vector_i= fn_embeddings[frame]
-        vector+= vector_i
-    if len(frame_list)> 0:
-        vector= vector/len(frame_list)
-    return vector
+        frame_index[frames[i].name]= i
+    return frame_index, len(frames)
+
+def get_FN_embeddings(phrases, FrameNet, frame_index, dim):
+    """Sparse (phrases x frames) matrix; each row is the average one-hot vector of the frames of a phrase."""
+    rows, columns, values = [], [], []
+    for i in range(len(phrases)):
+        frames= [frame for frame in FrameNet.get_phrase_frames(phrases[i]) if frame in frame_index]
+        for frame in frames:
+            rows.append(i)
+            columns.append(frame_index[frame])
+            values.append(1.0/len(frames))
+    return sparse.csr_matrix((values, (rows, columns)), shape=(len(phrases), dim))
+
+def read_terms(file_path):
+    with open(file_path) as f:
+        lines= f.read().split('\n')
+    return [line.split('\t')[0] for line in lines if line.strip()!= '']
+
+def get_features(phrases, embeddings, FrameNet=None, frame_index=None, fn_dim=0):
+    vectors= get_phrase_matrix(phrases, embeddings)
+    if FrameNet is None:
+        return vectors
+    frame_vectors= get_FN_embeddings(phrases, FrameNet, frame_index, fn_dim)
+    return sparse.hstack([sparse.csr_matrix(vectors), frame_vectors]).tocsr()
 
 def cluster_words(path, using_FN=True):
+    """Feature matrices of the variables and of the counted nouns and verbs, with the phrase of every row.
+
+    Rows are embeddings averaged over the words of a phrase; with `using_FN` the FrameNet frames of the
+    phrase are appended as sparse columns.
+    """
     embeddings= set_embeddings('embeddings.txt')
-    dim=50
+    FrameNet, frame_index, fn_dim= None, None, 0
     if using_FN:
         FrameNet= FrameNetFrames()
-        fn_embeddings, fn_dim= set_FN_embeddings()
-        dim+= fn_dim
-    inverse_embeddings={}
-    f= open(path+ 'NounCount.txt')
-    words= f.read().split('\n')
-    f.close()
-    f = open(path + 'VerbCount.txt')
-    words+= f.read().split('\n')
-    f.close()
-    word_vectors = np.zeros(dim)
-    for item in words:
-        word, ccount= item.split('\t')
-        word_embedding = get_phrase_embeddings(word, embeddings)
-        if using_FN:
-            frames= FrameNet.get_phrase_frames(word)
-            word_embedding = np.append(word_embedding, get_FN_embeddings(frames, fn_embeddings, fn_dim))
-        word_vectors= np.vstack([word_vectors, word_embedding])
-        if str(word_embedding) not in inverse_embeddings:
-            inverse_embeddings[str(word_embedding)]= word
-    f= open(path+'Variables_Len4.txt')
-    variables= f.read().split('\n')
-    f.close()
-    variable_vectors=np.zeros(dim)
-    for variable in variables:
-        variable= variable.lower()
-        variable_embedding= get_phrase_embeddings(v, embeddings)
-        if using_FN:
-            frames= FrameNet.get_phrase_frames(variable)
-            variable_embedding = np.append(variable_embedding, get_FN_embeddings(frames, fn_embeddings, fn_dim))
-        variable_vectors= np.vstack([variable_vectors, variable_embedding])
-        if str(variable_embedding) not in inverse_embeddings:
-            inverse_embeddings[str(variable_embedding)]= variable
-    return variable_vectors, word_vectors, inverse_embeddings
-
-def run_K_means(X, Y, inverse_embeddings, joint=False):
+        frame_index, fn_dim= set_FN_embeddings()
+    words= read_terms(path+ 'NounCount.txt')+ read_terms(path+ 'VerbCount.txt')
+    variables= [variable.lower() for variable in read_terms(path+'Variables_Len4.txt')]
+    word_vectors= get_features(words, embeddings, FrameNet, frame_index, fn_dim)
+    variable_vectors= get_features(variables, embeddings, FrameNet, frame_index, fn_dim)
+    return variable_vectors, word_vectors, variables, words
+
+def run_K_means(X, Y, X_phrases, Y_phrases, n_clusters=100, joint=False, mini_batch=False, batch_size=1024):
+    """Clusters the rows of X (and Y, if joint) and assigns the rows of Y to the clusters.
+
+    MiniBatchKMeans is used with `mini_batch`, for vocabularies too large for KMeans.
+    """
+    if mini_batch:
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=0)
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=0)
     if joint:
-        kmeans = KMeans(n_clusters=100, random_state=0).fit(np.vstack([X, Y]))
+        data = sparse.vstack([X, Y]) if sparse.issparse(X) else np.vstack([X, Y])
+        kmeans.fit(data)
     else:
-        kmeans = KMeans(n_clusters=100, random_state=0).fit(X)
+        kmeans.fit(X)
+    X_pred= kmeans.labels_[:X.shape[0]]
     Y_pred= kmeans.predict(Y)
-    clusters= {i: {'X':[], 'Y':[]} for i in range(101)}
-    for i in range(len(X)):
-        if str(X[i]) in inverse_embeddings:
-            word= inverse_embeddings[str(X[i])]
-            label= kmeans.labels_[i]
-            clusters[label]['X'].append(word)
-    for i in range(len(Y_pred)):
-        if str(Y[i]) in inverse_embeddings:
-            word = inverse_embeddings[str(Y[i])]
-            label = Y_pred[i]
-            clusters[label]['Y'].append(word)
+    clusters= {i: {'X':[], 'Y':[]} for i in range(n_clusters)}
+    for i in range(len(X_phrases)):
+        clusters[X_pred[i]]['X'].append(X_phrases[i])
+    for i in range(len(Y_phrases)):
+        clusters[Y_pred[i]]['Y'].append(Y_phrases[i])
     return clusters
 
 
-file_list= set(os.listdir(project+ '/outputStanford'))
-file_list= file_list- {'.DS_Store'}
-write_NGrams(file_list)
-#relatedVerbList(fileList[0])
-###Use command line or whatever function in order to cluster words
+if __name__ == '__main__':
+    file_list= set(os.listdir(project+ '/outputStanford'))
+    file_list= file_list- {'.DS_Store'}
+    write_NGrams(file_list, state_path= project+ '/OntologyFiles/ngram_state.json')
+    #relatedVerbList(fileList[0])
+    ###Use command line or whatever function in order to cluster words
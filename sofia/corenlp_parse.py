@@ -1,12 +1,41 @@
 
 
 verb_tags=["VB", "VBP", "VBD", "VBZ", "VBN", "VBG"]
+# Heads of base noun phrases and the dependency relations that attach words to them, for annotations
+# made without the constituency parser.
+chunk_heads= {"NN", "NNS", "NNP", "NNPS", "PRP", "EX", "CD"}
+chunk_left_relations= {"det", "amod", "compound", "nummod", "advmod", "conj"}
+chunk_right_relations= {"nummod", "case"}
 
 class DataExtractor:
-    def __init__(self, annotations):
+    """Structures CoreNLP annotations per sentence.
+
+    Noun phrases come from the constituency `parse` when the annotations have one, or are chunked from
+    the enhanced dependencies and POS tags when they were made without the parser (fast profile).
+    `noun_phrases` forces one source: 'parse' or 'dependencies'.
+    """
+    def __init__(self, annotations, noun_phrases=None):
         self.annotations = annotations
+        self.noun_phrases = noun_phrases
         self.structuredData, self.sentences= self.structure_data()
 
+    @classmethod
+    def from_structured(cls, structured):
+        """Rebuilds a DataExtractor from the output of `get_structured` (e.g. loaded back from JSON)."""
+        data_extractor= cls.__new__(cls)
+        data_extractor.annotations= None
+        data_extractor.noun_phrases= structured.get('noun_phrases')
+        data_extractor.sentences= structured['sentences']
+        data_extractor.structuredData= structured['structuredData']
+        for sentence_data in data_extractor.structuredData:
+            sentence_data['spans']= [tuple(span) for span in sentence_data['spans']]
+        return data_extractor
+
+    def get_structured(self):
+        """The ontology independent data of the document: tokens, lemmas, POS tags, noun phrases,
+        dependencies, locations and dates of every sentence."""
+        return {'noun_phrases': self.noun_phrases, 'sentences': self.sentences, 'structuredData': self.structuredData}
+
     def structure_data(self):
         sentences=[]
         structured_data=[]
@@ -14,7 +43,7 @@ class DataExtractor:
         for i in range(len(data['sentences'])):
             dep = data['sentences'][i]['enhancedPlusPlusDependencies']
             sentTokens= data['sentences'][i]['tokens']
-            parse= data['sentences'][i]['parse']
+            parse= data['sentences'][i].get('parse')
             sentence= ""
             pos=[]
             tokens=[]
@@ -47,7 +76,10 @@ class DataExtractor:
                 spans.append((start, end))
             time=time.strip(', ')
             loc= loc.strip(', ')
-            noun_phrases= self.process_parse(parse, tokens)
+            if self.noun_phrases== 'dependencies' or (parse is None and self.noun_phrases!= 'parse'):
+                noun_phrases= self.process_dependencies(dep, tokens)
+            else:
+                noun_phrases= self.process_parse(parse, tokens)
             sentence_data = {"tokens": tokens, "lemmas": lemmas, "pos": pos, "location": loc, "temporal": time,
                              "NPs": noun_phrases, "deps": dep, "sentence": sentence, "spans": spans}
             sentences.append(sentence)
@@ -55,7 +87,7 @@ class DataExtractor:
         return structured_data, sentences
 
     def process_parse(self, parse, mapping):
-        noun_phrases={}
+        token_spans=[]
         for line in parse.split('\n'):
             s= line.split('(')
             head= str(s[1]).strip(' ')
@@ -67,29 +99,75 @@ class DataExtractor:
                     w = item.strip(') ').split(' ')[1]
                     phrase+= w+' '
                 phrase=phrase.strip(' ')
-                start_index, end_index= self.find_nominal_term(mapping, phrase.split(' '), 'token')
-                start= mapping[start_index]['start']
-                end= mapping[end_index-1]['end'] ##Changed to endIndex-1 from endIndex???
-                lemma= mapping[end_index-1]['lemma']
-                nounP=""
-                qualifier= ""
-                text=""
-                eventuality={}
-                for item in mapping[start_index:end_index]:
-                    text+= item['token']+ ' '
-                    if item['pos']== verb_tags:
-                        eventuality= {'token': item['token'], 'start': item['start'], 'end':item['end'], 'lemma': item['lemma']}
-                    # TODO: Keep only qualifier wrt quantity. Find a way to filter those from the Adjectives?
-                    elif item['pos']== 'JJ' or item['pos']=='JJS':
-                        qualifier+= item['token'] +' '
-                    elif item['pos']== 'CD':
-                        qualifier += item['token'] + ' '
-                    else:
-                        nounP+= item['token']+ ' '
-                nounP= nounP.strip(' ')
-                text=text.strip(' ')
-                noun_phrases[start]= {'text': text, 'start': start, 'end': end, 'token': nounP, 'head_lemma': lemma,
-                                 'eventuality': eventuality, 'qualifier': qualifier.strip()}
+                token_spans.append(self.find_nominal_term(mapping, phrase.split(' '), 'token'))
+        return self.build_noun_phrases(token_spans, mapping)
+
+    def process_dependencies(self, deps, mapping):
+        """Chunks base noun phrases from the dependencies: a nominal head with the contiguous determiners,
+        modifiers, compounds and numbers attached to it (and a possessive marker or number right after it)."""
+        governors= {}
+        for dep in deps:
+            governors.setdefault(dep['dependent']- 1, []).append((dep['governor']- 1, dep['dep'].split(':')[0]))
+        def attached(index, members, relations):
+            return any(governor in members and relation in relations for governor, relation in governors.get(index, []))
+        token_spans=[]
+        assigned= set()
+        for head in range(len(mapping)- 1, -1, -1):
+            if head in assigned or mapping[head]['pos'] not in chunk_heads:
+                continue
+            if mapping[head]['pos']== 'CD' and any(governor< head and relation== 'nummod' and
+                                                   mapping[governor]['pos'] in chunk_heads
+                                                   for governor, relation in governors.get(head, [])):
+                # "March 2017": the number joins the phrase of the noun before it
+                continue
+            members= {head}
+            start, end= head, head+ 1
+            while start> 0 and start- 1 not in assigned:
+                index= start- 1
+                if attached(index, members, chunk_left_relations):
+                    members.add(index)
+                elif mapping[index]['pos']== 'CC' and index> 0 and attached(index- 1, members, chunk_left_relations):
+                    # "food and fuel prices": the conjunction attaches to the first conjunct
+                    members.update({index, index- 1})
+                    index-= 1
+                else:
+                    break
+                start= index
+            while end< len(mapping) and end not in assigned and attached(end, members, chunk_right_relations) \
+                    and mapping[end]['pos'] in ('POS', 'CD'):
+                members.add(end)
+                end+= 1
+            assigned.update(range(start, end))
+            token_spans.append((start, end))
+        token_spans.reverse()
+        return self.build_noun_phrases(token_spans, mapping)
+
+    def build_noun_phrases(self, token_spans, mapping):
+        """Builds the noun phrase records for (start, end) token spans and merges neighbouring phrases."""
+        noun_phrases={}
+        for start_index, end_index in token_spans:
+            start= mapping[start_index]['start']
+            end= mapping[end_index-1]['end'] ##Changed to endIndex-1 from endIndex???
+            lemma= mapping[end_index-1]['lemma']
+            nounP=""
+            qualifier= ""
+            text=""
+            eventuality={}
+            for item in mapping[start_index:end_index]:
+                text+= item['token']+ ' '
+                if item['pos']== verb_tags:
+                    eventuality= {'token': item['token'], 'start': item['start'], 'end':item['end'], 'lemma': item['lemma']}
+                # TODO: Keep only qualifier wrt quantity. Find a way to filter those from the Adjectives?
+                elif item['pos']== 'JJ' or item['pos']=='JJS':
+                    qualifier+= item['token'] +' '
+                elif item['pos']== 'CD':
+                    qualifier += item['token'] + ' '
+                else:
+                    nounP+= item['token']+ ' '
+            nounP= nounP.strip(' ')
+            text=text.strip(' ')
+            noun_phrases[start]= {'text': text, 'start': start, 'end': end, 'token': nounP, 'head_lemma': lemma,
+                             'eventuality': eventuality, 'qualifier': qualifier.strip()}
         merged_noun_phrases= self.merge_neighbour_phrases(noun_phrases)
         return merged_noun_phrases
 
@@ -2,7 +2,14 @@ import string
 import enchant
 from nltk.tokenize import sent_tokenize
 import PyPDF2
+import hashlib
+import json
 import os
+import re
+import time
+from array import array
+from bisect import bisect_right
+from multiprocessing import Pool
 
 #d=  enchant.Dict("en_US")
 
@@ -52,61 +59,156 @@ def preprocess_docs(doc_list, path):
         f.write(clean_doc)
         f.close()
 
-def pdf2text(path):
-    files = os.listdir(path)
-    for f in files:
-        try:
-            pdfFileObj = open(path+ '/' + f, 'rb')
-            pdfReader = PyPDF2.PdfFileReader(pdfFileObj)
-            text = ""
-            for page in range(pdfReader.numPages):
-                text += pdfReader.getPage(page).extractText()
-            f=f.strip('.pdf')
-            file = open(path+'_text/' + f+'.txt', 'w')
-            file.write(text)
-            file.close()
-        except:
-            print('Non-parsed...')
-        print(f)
+def pdf_sha1(pdf_path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def extract_pages(pdf_path, record):
+    """Yields the text of each page of a PDF, recording the page count and the pages that could not be extracted."""
+    with open(pdf_path, 'rb') as pdfFileObj:
+        pdfReader = PyPDF2.PdfFileReader(pdfFileObj)
+        record['pages'] = pdfReader.numPages
+        for page in range(pdfReader.numPages):
+            try:
+                yield pdfReader.getPage(page).extractText()
+            except Exception as e:
+                record['failed_pages'].append({'page': page, 'error': repr(e)})
+
+def split_page_tail(text):
+    """Splits off the trailing sentence fragment of a page so it can be joined with the next page."""
+    end = max(text.rfind('. '), text.rfind('.\n'))
+    if end < 0:
+        return '', text
+    return text[:end + 1], text[end + 1:]
+
+def extract_pdf(job):
+    pdf_path, text_path, prev_hash = job
+    record = {'sha1': None, 'pages': 0, 'failed_pages': [], 'seconds': 0.0, 'error': None}
+    start = time.time()
+    try:
+        record['sha1'] = pdf_sha1(pdf_path)
+        if record['sha1'] == prev_hash and os.path.exists(text_path):
+            return pdf_path, record, True
+        tail = ''
+        with open(text_path + '.part', 'w') as out:
+            for page_text in extract_pages(pdf_path, record):
+                head, tail = split_page_tail(tail + page_text)
+                out.write(clean_text(head))
+            out.write(clean_text(tail))
+        os.replace(text_path + '.part', text_path)
+    except Exception as e:
+        record['error'] = repr(e)
+        if os.path.exists(text_path + '.part'):
+            os.remove(text_path + '.part')
+    record['seconds'] = round(time.time() - start, 3)
+    return pdf_path, record, False
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_path):
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def pdf2text(path, workers=None, manifest_name='manifest.json', save_every=100):
+    """Extracts and cleans the text of every PDF in `path` into `path`_text, one file per PDF.
+
+    Files are extracted in parallel, pages are cleaned as they are read and a manifest with the
+    content hash, page count, timing and failures of every PDF is kept next to the text files.
+    The manifest is saved every `save_every` extracted files and at the end, so an interrupted run
+    loses at most that many records. PDFs whose content hash did not change since the last run are skipped.
+    """
+    text_dir = path + '_text'
+    if not os.path.exists(text_dir):
+        os.makedirs(text_dir)
+    manifest_path = text_dir + '/' + manifest_name
+    manifest = load_manifest(manifest_path)
+    jobs = []
+    for f in sorted(os.listdir(path)):
+        if not f.lower().endswith('.pdf'):
+            continue
+        name = os.path.splitext(f)[0]
+        prev_hash = manifest.get(f, {}).get('sha1')
+        jobs.append((path + '/' + f, text_dir + '/' + name + '.txt', prev_hash))
+    unsaved = 0
+    with Pool(workers) as pool:
+        for pdf_path, record, skipped in pool.imap_unordered(extract_pdf, jobs):
+            f = os.path.basename(pdf_path)
+            if skipped:
+                print(f'Unchanged {f}')
+                continue
+            manifest[f] = record
+            unsaved += 1
+            if unsaved >= save_every:
+                save_manifest(manifest, manifest_path)
+                unsaved = 0
+            if record['error'] is not None:
+                print(f'Non-parsed {f}: {record["error"]}')
+            else:
+                print(f'{f}: {record["pages"]} pages in {record["seconds"]}s')
+    if unsaved:
+        save_manifest(manifest, manifest_path)
+    return manifest
+
+class OffsetMap:
+    """Maps character offsets of a text with inline annotations removed back to the annotated text.
+
+    Every run of copied characters is stored as a pair (clean start, original start), so a lookup is
+    a binary search over the runs.
+    """
+    def __init__(self):
+        self.clean_starts = array('q')
+        self.original_starts = array('q')
+
+    def add_run(self, clean_start, original_start):
+        self.clean_starts.append(clean_start)
+        self.original_starts.append(original_start)
+
+    def to_original(self, offset, end=False):
+        if end and offset > 0:
+            return self.to_original(offset - 1) + 1
+        run = bisect_right(self.clean_starts, offset) - 1
+        if run < 0:
+            return offset
+        return self.original_starts[run] + offset - self.clean_starts[run]
+
+    def __len__(self):
+        return len(self.clean_starts)
 
 def remove_annotations(text_init, limit_left, limit_right):
-    annotation_spans={}
-    text= ''
-    i=0
-    new_i=0
-    while i< len(text_init):
-        letter_curr= text_init[i]
-        if limit_left== letter_curr:
-            annotation= letter_curr
-            loop= True
-            loop2 = True
-            start=0
-            end=1
-            while loop:
-                i += 1
-                letter_curr = text_init[i]
-                annotation+= letter_curr
-                if limit_right== letter_curr and loop2:
-                    i+=1
-                    letter_curr = text_init[i]
-                    annotation += letter_curr
-                    start = new_i
-                    while loop2:
-                        if limit_left== letter_curr:
-                            loop2=False
-                            end= new_i
-                            new_i-=1
-                        else:
-                            text += letter_curr
-                            i += 1
-                            new_i += 1
-                            letter_curr = text_init[i]
-                            annotation += letter_curr
-                elif limit_right== letter_curr:
-                    loop= False
-                    annotation_spans[(start, end)] = annotation
-        else:
-            text+= letter_curr
-        i += 1
-        new_i += 1
-    return text, annotation_spans
\ No newline at end of file
+    """Strips inline annotations of the form <tag>text<tag> (with the given limits) from a text.
+
+    Returns the clean text, a dict from the (start, end) span of every annotated text in the clean text
+    to the full annotation, and an OffsetMap from clean offsets back to offsets in `text_init`.
+    Unterminated annotations are kept as plain text.
+    """
+    left, right = re.escape(limit_left), re.escape(limit_right)
+    tag = f'{left}[^{right}]*{right}'
+    pattern = re.compile(f'{tag}([^{left}]*){tag}')
+    annotation_spans = {}
+    offset_map = OffsetMap()
+    pieces = []
+    new_i = 0
+    prev = 0
+    for match in pattern.finditer(text_init):
+        if match.start() > prev:
+            offset_map.add_run(new_i, prev)
+            pieces.append(text_init[prev:match.start()])
+            new_i += match.start() - prev
+        annotated = match.group(1)
+        offset_map.add_run(new_i, match.start(1))
+        pieces.append(annotated)
+        annotation_spans[(new_i, new_i + len(annotated))] = match.group(0)
+        new_i += len(annotated)
+        prev = match.end()
+    if prev < len(text_init):
+        offset_map.add_run(new_i, prev)
+        pieces.append(text_init[prev:])
+    return ''.join(pieces), annotation_spans, offset_map
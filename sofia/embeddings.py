@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+
+
+class EmbeddingStore:
+    """Word vectors kept in a memory-mapped float32 matrix with a word -> row vocabulary.
+
+    A GloVe style text file (one word and its values per line) is converted once into `<prefix>.npy`
+    and `<prefix>.vocab`; later loads map the matrix instead of parsing the text.
+    """
+
+    def __init__(self, vectors, words):
+        self.vectors = vectors
+        self.dim = vectors.shape[1]
+        self.vocab = {}
+        for row in range(len(words)):
+            self.vocab[words[row]] = row
+
+    @classmethod
+    def load(cls, text_path, prefix=None):
+        if prefix is None:
+            prefix = os.path.splitext(text_path)[0]
+        if not os.path.exists(prefix + '.npy') or os.path.getmtime(prefix + '.npy') < os.path.getmtime(text_path):
+            cls.convert(text_path, prefix)
+        vectors = np.load(prefix + '.npy', mmap_mode='r')
+        with open(prefix + '.vocab', encoding='utf-8') as f:
+            words = f.read().split('\n')[:vectors.shape[0]]
+        return cls(vectors, words)
+
+    @staticmethod
+    def convert(text_path, prefix):
+        rows, dim = 0, None
+        with open(text_path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip() == '':
+                    continue
+                if dim is None:
+                    dim = len(line.rstrip('\n').split(' ')) - 1
+                rows += 1
+        vectors = np.lib.format.open_memmap(prefix + '.npy.tmp', mode='w+', dtype=np.float32, shape=(rows, dim))
+        words = []
+        with open(text_path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip() == '':
+                    continue
+                values = line.rstrip('\n').split(' ')
+                vectors[len(words)] = np.array(values[1:dim + 1], dtype=np.float32)
+                words.append(values[0])
+        vectors.flush()
+        del vectors
+        with open(prefix + '.vocab.tmp', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(words))
+        os.replace(prefix + '.vocab.tmp', prefix + '.vocab')
+        os.replace(prefix + '.npy.tmp', prefix + '.npy')
+
+    def __contains__(self, word):
+        return word in self.vocab
+
+    def __getitem__(self, word):
+        return self.vectors[self.vocab[word]]
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def phrase_embeddings(self, phrases):
+        """(phrases x dim) matrix with the average vector of the known words of every phrase."""
+        rows, owners = [], []
+        for i in range(len(phrases)):
+            for word in phrases[i].split(' '):
+                row = self.vocab.get(word)
+                if row is not None:
+                    rows.append(row)
+                    owners.append(i)
+        embeddings = np.zeros((len(phrases), self.dim))
+        if len(rows) == 0:
+            return embeddings
+        owners = np.asarray(owners)
+        phrase_ids, starts, counts = np.unique(owners, return_index=True, return_counts=True)
+        sums = np.add.reduceat(self.vectors[np.asarray(rows)].astype(np.float64), starts, axis=0)
+        embeddings[phrase_ids] = sums / counts[:, None]
+        return embeddings
@@ -1,5 +1,9 @@
+from bisect import bisect_left
+
 from sofia.frames_FN_mapping import FrameNetFrames
+from sofia.lexical_classifier import LexicalClassifier
 from sofia.ontology_mapping import Ontology
+from sofia.semantic_units import Argument, Entity, Event, no_argument
 
 
 
@@ -13,14 +17,15 @@ nounTags= ["NN", "NNS", "NNP", "NNPS", "JJ"]
 
 class CandidateEvents:
 
-    def __init__(self, data_extractor, refiner= None):
+    def __init__(self, data_extractor, refiner= None, lexicon= None):
         self.data_extractor = data_extractor
         self.sentences= self.data_extractor.sentences
-        if refiner != None:
-            self.ontology = Ontology(refiner)
-        else:
-            self.ontology = None
-        self.frameNet= FrameNetFrames()
+        if lexicon is None:
+            ontology = Ontology(refiner) if refiner != None else None
+            lexicon = LexicalClassifier(FrameNetFrames(), ontology)
+        self.lexicon= lexicon
+        self.ontology = lexicon.ontology
+        self.frameNet= lexicon.frameNet
 
 
     def overlap(self, span, keys):
@@ -32,12 +37,37 @@ class CandidateEvents:
                 return True, (s2, t2)
         return False, (0, 0)
 
-    def get_verb_events(self, s_index, events2, events, entities, refine=True):
+    def index_mentions(self, s_index, units, mentions=None):
+        """Maps every token position of a sentence to the span of the unit (noun phrase) covering it.
+
+        Units are keyed by character span; a given `mentions` list is copied and overlaid.
+        """
+        spans= self.data_extractor.get_sentence_data(s_index)["spans"]
+        starts= [span[0] for span in spans]
+        mentions= [None]* len(spans) if mentions is None else list(mentions)
+        for span in units.keys():
+            i= bisect_left(starts, span[0])
+            while i< len(spans) and spans[i][1]<= span[1]:
+                mentions[i]= span
+                i+= 1
+        return mentions
+
+    def index_governors(self, s_index):
+        """Groups the dependencies of a sentence by governor: governor -> [(type, dependent index)]."""
+        governors={}
+        for dependency in self.data_extractor.get_dependencies(s_index):
+            governor = int(dependency['governor'])
+            governors.setdefault(governor, []).append((dependency['dep'], int(dependency['dependent'])))
+        return governors
+
+    def get_verb_events(self, s_index, events2, events, entities, mentions=None, refine=True):
+        if mentions is None:
+            mentions= self.index_mentions(s_index, entities)
+        governors= self.index_governors(s_index)
         data= self.data_extractor.get_sentence_data(s_index)
         pos= data["pos"]
         lemmas= data["lemmas"]
         tokens= data["tokens"]
-        sentence= data["sentence"]
         spans = data["spans"]
         s_events = events
         s_events2= events2
@@ -48,40 +78,39 @@ class CandidateEvents:
             if overlap1[0]:
                 span= overlap1[1]
                 s_events[span] = events[span]
-                s_events[span].update({"index": i})
+                s_events[span].index= i
+                if s_events[span].start_index is None:
+                    s_events[span].start_index= i
             elif overlap2[0]:
                 span= overlap2[1]
                 s_events2[span] = events2[span]
-                s_events2[span].update({"index": i})
+                s_events2[span].index= i
+                if s_events2[span].start_index is None:
+                    s_events2[span].start_index= i
             elif pos[i] in verbTags and lemmas[i] not in aux:
                 lemma_type_FN= "event"
                 frame= ""
                 if refine:
-                    frame_FN, lemma_type_FN= self.frameNet.refine_word(sentence, lemmas[i], pos[i])
-                    if self.ontology!=None:
-                        frame, lemma_type = self.ontology.refine_word(sentence, lemmas[i], pos[i])
-                    else:
-                        frame= frame_FN
-                        lemma_type= lemma_type_FN
+                    frame_FN, lemma_type_FN, frame, lemma_type= self.lexicon.classify(lemmas[i], pos[i])
                 if lemma_type_FN=="event" or lemma_type=="event" or lemma_type=="property":
                     token= tokens[i]
                     if lemma_type=='property':
-                        s_events2[span] = {"trigger": token["token"], "lemma": lemmas[i], "index": i,
-                                                "frame": frame, 'frame_FN': frame_FN, "temporal": data["temporal"],
-                                                "location": data["location"]}
+                        s_events2[span] = Event(span, token["token"], frame, frame_FN, data["location"],
+                                                data["temporal"], lemma=lemmas[i], index=i)
                     else:
-                        srl_output= self.get_dependencies(s_index, i+1, entities)
-                        s_events[span] ={"trigger": token["token"], "lemma": lemmas[i], "index": i, "frame": frame,
-                                         'frame_FN': frame_FN, "temporal": data["temporal"], "location": data["location"]}
-                        s_events[span].update(srl_output)
+                        agent, patient= self.get_dependencies(governors, i+1, mentions, entities)
+                        s_events[span] = Event(span, token["token"], frame, frame_FN, data["location"],
+                                               data["temporal"], lemma=lemmas[i], index=i, agent=agent,
+                                               patient=patient)
         properties = {}
+        mapped=dict(entities)
+        mapped.update(s_events)
+        mapped_mentions= self.index_mentions(s_index, s_events, mentions)
         for span in s_events2.keys():
-            if 'index' in s_events2[span]:
-                e_index= s_events2[span]['index']
-                mapped=dict(entities)
-                mapped.update(s_events)
-                srl_output = self.get_dependencies(s_index, e_index + 1, mapped)
-                s_events2[span].update(srl_output)
+            if s_events2[span].index is not None:
+                e_index= s_events2[span].index
+                s_events2[span].agent, s_events2[span].patient = self.get_dependencies(governors, e_index + 1,
+                                                                                      mapped_mentions, mapped)
                 properties[span] = s_events2[span]
         return properties, s_events
 
@@ -90,28 +119,27 @@ class CandidateEvents:
         events=[]
         entities=[]
         for s_index in range(self.data_extractor.get_data_size()):
-            s_events2, s_events, s_entities = self.classify_nominals(s_index)
-            s_events2, s_events= self.get_verb_events(s_index, s_events2, s_events, s_entities)
-            s_events.update(s_events2)
+            s_events, s_entities = self.get_sentence_units(s_index)
             events.append(s_events)
             entities.append(s_entities)
         return events, entities
 
+    def get_sentence_units(self, s_index):
+        s_events2, s_events, s_entities = self.classify_nominals(s_index)
+        mentions= self.index_mentions(s_index, s_entities)
+        s_events2, s_events= self.get_verb_events(s_index, s_events2, s_events, s_entities, mentions)
+        s_events.update(s_events2)
+        return s_events, s_entities
+
     #TODO: fix here for the quantitative? Figure it out after quant nominals are taken care???
-    def get_dependencies(self, s_index, e_index, entities):
-        s_dependencies= self.data_extractor.get_dependencies(s_index)
+    def get_dependencies(self, governors, e_index, mentions, entities):
         agent= []
         patient= []
         event_dependencies={}
-        for dependency in s_dependencies:
-            governor = int(dependency['governor'])
-            dependency_type = dependency['dep']
-            dependent = str(dependency['dependentGloss'])
-            if governor == e_index:
-                prev=[]
-                if dependency_type in event_dependencies.keys():
-                    prev= event_dependencies[dependency_type]
-                event_dependencies[dependency_type] = prev+ [dependent]
+        for dependency_type, dependent in governors.get(e_index, []):
+            if dependency_type not in event_dependencies:
+                event_dependencies[dependency_type] = []
+            event_dependencies[dependency_type].append(dependent)
         passive= False
         if "nsubj" in event_dependencies.keys():
             agent= event_dependencies["nsubj"]
@@ -127,77 +155,63 @@ class CandidateEvents:
                         agent= event_dependencies[relation]
                     elif patient== []:
                         patient= event_dependencies[relation]
-        srl_output={'agent':(0, ""), 'patient':(0, "")}
+        agent_argument, patient_argument= no_argument, no_argument
         if agent!= []:
-            srl_output['agent']= self.map_to_entity(agent, entities)
+            agent_argument= self.map_to_entity(agent, mentions, entities)
         if patient!= []:
-            srl_output['patient']= self.map_to_entity(patient, entities)
-        return srl_output
+            patient_argument= self.map_to_entity(patient, mentions, entities)
+        return agent_argument, patient_argument
 
-    def map_to_entity(self, terms, noun_phrases):
-        normalized=""
+    def map_to_entity(self, dependents, mentions, noun_phrases):
+        """Maps dependents (1-based token indices) to the noun phrases covering them."""
         mySpan=[]
-        for span in noun_phrases.keys():
-            noun_phrase= noun_phrases[span]
-            entity= noun_phrase["trigger"]
-            norm= ""
-            for term in terms:
-                if term in entity:
-                    norm= entity
-                    mySpan.append(span)
-            if norm!="":
-                normalized+= norm+', '
+        normalized=""
+        for dependent in dependents:
+            if not 0< dependent<= len(mentions):
+                continue
+            span= mentions[dependent-1]
+            if span is not None and span not in mySpan:
+                mySpan.append(span)
+                normalized+= noun_phrases[span].trigger+', '
         normalized = normalized.strip(', ')
-        return mySpan, normalized
+        return Argument(mySpan, normalized)
 
     def classify_nominals(self, s_index):
         events = {}
         entities={}
         events2={}
         data = self.data_extractor.get_sentence_data(s_index)
-        sentence = data["sentence"]
         nominals = data["NPs"]
         lemmas = data['lemmas']
         #Missing index variable??
         for noun_phrase in nominals:
             span= (noun_phrase['start'], noun_phrase['end'])
             head_lemma = noun_phrase['head_lemma']
-            frames_head_FN, head_type_FN = self.frameNet.refine_word(sentence, head_lemma, 'NN')
-            if self.ontology!=None:
-                frames_head, head_type = self.ontology.refine_word(sentence, head_lemma, 'NN')
-            else:
-                frames_head= frames_head_FN
-                head_type = head_type_FN
+            frames_head_FN, head_type_FN, frames_head, head_type = self.lexicon.classify(head_lemma, 'NN')
             #The NP is part of an eventuality, thus NP is entity
             if len(noun_phrase['eventuality'])>0:
-                entities[span]= {'text':noun_phrase['text'], 'trigger': noun_phrase['token'], 'frame': frames_head,
-                                 'frame_FN': frames_head_FN, 'qualifier': noun_phrase['qualifier']}
+                entities[span]= Entity(span, noun_phrase['text'], noun_phrase['token'], frames_head, frames_head_FN,
+                                       noun_phrase['qualifier'])
                 event = noun_phrase['eventuality']
                 lemma= event['lemma']
-                frame_lemma_FN, lemma_type_FN = self.frameNet.refine_word(sentence, lemma, 'VBG')
-                if self.ontology!=None:
-                    frame_lemma, lemma_type = self.ontology.refine_word(sentence, lemma, 'VBG')
-                else:
-                    frame_lemma= frame_lemma_FN
-                    lemma_type= lemma_type_FN
+                frame_lemma_FN, lemma_type_FN, frame_lemma, lemma_type = self.lexicon.classify(lemma, 'VBG')
                 if lemma_type_FN=="event" or lemma_type=="event" or lemma_type=="property":
                     event_span= (event['start'], event['end'])
                     if lemma_type== 'property':
-                        events2[event_span]= {'trigger': event['token'], 'location': data['location'],
-                                        'temporal': data['temporal'], 'frame': frame_lemma, 'frame_FN': frame_lemma_FN}
+                        events2[event_span]= Event(event_span, event['token'], frame_lemma, frame_lemma_FN,
+                                                   data['location'], data['temporal'])
                     else:
-                        events[event_span]= {'trigger': event['token'], 'location': data['location'],
-                                            'temporal': data['temporal'], 'patient': ([span], noun_phrase['token']),
-                                             'agent':(0, ""), 'frame': frame_lemma, 'frame_FN': frame_lemma_FN}
+                        events[event_span]= Event(event_span, event['token'], frame_lemma, frame_lemma_FN,
+                                                  data['location'], data['temporal'],
+                                                  patient=Argument([span], noun_phrase['token']))
             elif head_type_FN=="event" or head_type=="event" or head_type=="property":
                 if head_type== 'property':
-                    events2[span] = {'trigger': noun_phrase['text'], 'frame': frames_head, 'frame_FN': frames_head_FN,
-                                     'location': data['location'], 'temporal': data['temporal']}
+                    events2[span] = Event(span, noun_phrase['text'], frames_head, frames_head_FN, data['location'],
+                                          data['temporal'])
                 else:
-                    events[span] = {'trigger': noun_phrase['text'], 'frame': frames_head, 'frame_FN': frames_head_FN,
-                                    'location': data['location'], 'temporal': data['temporal'],
-                                    'patient': (0, ""), 'agent':(0, "")}
+                    events[span] = Event(span, noun_phrase['text'], frames_head, frames_head_FN, data['location'],
+                                         data['temporal'])
             else:
-                entities[span] = {'text':noun_phrase['text'],'trigger': noun_phrase['token'], 'frame': frames_head,
-                                  'frame_FN': frames_head_FN, 'qualifier': noun_phrase['qualifier']}
+                entities[span] = Entity(span, noun_phrase['text'], noun_phrase['token'], frames_head, frames_head_FN,
+                                        noun_phrase['qualifier'])
         return events2, events, entities
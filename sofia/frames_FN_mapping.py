@@ -1,14 +1,13 @@
-from nltk.corpus import framenet as fn
-from nltk.corpus import wordnet as wn
-from nltk.wsd import lesk
-from nltk.stem import WordNetLemmatizer
 import os
-import string
 import ast
 import json
 
+from sofia.wsd import LeskDisambiguator
+
 class FrameNetFrames:
     def __init__(self, external=False):
+        # nltk is imported here rather than at module level: importing it takes about a second
+        from nltk.stem import WordNetLemmatizer
         self.dir = os.path.dirname(os.getcwd())
         self.dir= os.getcwd()
         self.verb_tags=["VB", "VBP", "VBD", "VBZ", "VBN", "VBG"] #VBN and VBG maybe?
@@ -19,7 +18,9 @@ class FrameNetFrames:
         self.frame_LUs= self.get_FN_LUs()
         self.wn2Frame= self.wn_to_FN()
         self.external_frames= self.external_frames(external)
+        self.wsd= LeskDisambiguator()
         self.Causal=['Causation']
+        self.frame_types= self.index_frame_types()
 
     def get_FN_frames(self):
         event_path = os.path.dirname(os.path.abspath(__file__)) + '/data/event_frames.txt'
@@ -49,6 +50,7 @@ class FrameNetFrames:
         f.close()
         text= text.strip('\n')
         frames= text.split('\n\n\n')
+        from nltk.corpus import wordnet as wn
         wn_frames={}
         for frame in frames:
             details = frame.split('\n')
@@ -80,23 +82,28 @@ class FrameNetFrames:
 
     def get_word_wn_frames(self, sentence, lemma, pos):
         pos = self.get_pos(pos)
-        punc= string.punctuation
-        sentence_words= sentence.split(' ')
-        tokens= []
-        for word in sentence_words:
-            tokens.append(word.strip(punc))
-        synset = lesk(tokens, lemma, pos)
+        synset = self.wsd.disambiguate(sentence, lemma, pos)
         if synset in self.wn2Frame:
             frames= self.wn2Frame[synset]
             return frames
         return []
 
+    def get_sentence_wn_frames(self, sentence, lemmas, pos_tags):
+        """WordNet based frames for every noun, verb and adjective of a sentence, [] for other tokens."""
+        words= []
+        for lemma, pos in zip(lemmas, pos_tags):
+            pos= self.get_pos(pos)
+            words.append((lemma, pos if pos!= 'None' else None))
+        frames= []
+        for synset in self.wsd.disambiguate_sentence(sentence, words):
+            frames.append(self.wn2Frame.get(synset, []) if synset is not None else [])
+        return frames
+
     def get_word_frames(self, word, pos):
-        pos= self.get_pos(pos)
-        term= word+'.'+pos
-        if term not in self.frame_LUs:
-            return ""
-        return self.frame_LUs[term]
+        return self.get_lemma_frames(word, self.get_pos(pos))
+
+    def get_lemma_frames(self, word, coarse_pos):
+        return self.frame_LUs.get(word+'.'+coarse_pos, "")
 
 
     def get_phrase_frames(self, phrase):
@@ -116,19 +123,29 @@ class FrameNetFrames:
                         frames.append(frame)
         return frames
 
-    def refine_word(self, sentence, word, pos):
+    def index_frame_types(self):
+        """Maps every event frame to the event types (ontology nodes) that list it."""
         all_frames = {'root': self.frames}
         if self.external_frames!= None:
             all_frames= self.external_frames
-        frames= self.get_word_frames(word, pos)
+        frame_types= {}
+        for event_type in all_frames:
+            for frame in all_frames[event_type]:
+                if frame not in self.Causal:
+                    frame_types.setdefault(frame, []).append(event_type)
+        return frame_types
+
+    def refine_word(self, sentence, word, pos):
+        return self.refine_lemma(word, self.get_pos(pos))
+
+    def refine_lemma(self, word, coarse_pos):
+        frames= self.get_lemma_frames(word, coarse_pos)
         event_frames= set()
         event_types= set()
         for frame in frames:
-            if frame not in self.Causal:
-                for event_type in all_frames:
-                    if frame in all_frames[event_type]:
-                        event_types.add(event_type)
-                        event_frames.add(frame)
+            if frame in self.frame_types:
+                event_types.update(self.frame_types[frame])
+                event_frames.add(frame)
         if len(event_frames)>0:
             if self.external_frames!=None:
                 return list(event_types), "event"
@@ -0,0 +1,56 @@
+"""Reports where the import time of a module goes.
+
+    python -m sofia.import_profile                  # import sofia
+    python -m sofia.import_profile sofia.main --top 20
+
+Runs `python -X importtime -c "import MODULE"` in a fresh interpreter and prints the total, the time per
+top-level package and the slowest individual imports.
+"""
+import argparse
+import subprocess
+import sys
+
+
+def import_times(module):
+    """Returns [(name, self_us, cumulative_us, depth)] for every module imported by `import module`."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'import {module} failed:\n{result.stderr}')
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        times.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return times
+
+
+def report(module, times, top):
+    total = sum(self_us for _, self_us, _, _ in times)
+    target = [cumulative for name, _, cumulative, depth in times if name == module and depth == 0]
+    print(f'import {module}: {(target[0] if target else total) / 1000.0:.1f} ms '
+          f'({len(times)} modules, {total / 1000.0:.1f} ms including interpreter start-up imports)')
+    packages = {}
+    for name, self_us, _, _ in times:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    print('\nby top-level package (self time):')
+    for package, self_us in sorted(packages.items(), key=lambda k: k[1], reverse=True)[:top]:
+        print(f'  {self_us / 1000.0:9.1f} ms  {package}')
+    print('\nslowest imports (cumulative time):')
+    for name, _, cumulative_us, _ in sorted(times, key=lambda k: k[2], reverse=True)[:top]:
+        print(f'  {cumulative_us / 1000.0:9.1f} ms  {name}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import time breakdown of a module')
+    parser.add_argument('module', nargs='?', default='sofia')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+    report(args.module, import_times(args.module), args.top)
+
+
+if __name__ == '__main__':
+    main()
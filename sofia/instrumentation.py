@@ -0,0 +1,228 @@
+"""Per-stage timing, counters and error counters for the reading pipeline.
+
+Metrics are off unless the SOFIA_METRICS environment variable is set (`1` to record, `log` to record and
+log a summary on every flush()) or enable() is called. When off, stage() returns a shared no-op context
+manager and count()/error() return immediately, so instrumented code pays one attribute check.
+
+    with instrumentation.stage('annotate'):
+        annotations = client.annotate(text)
+    instrumentation.count('sentences', len(annotations['sentences']))
+    instrumentation.snapshot()          # in-process view
+    instrumentation.prometheus_text()   # Prometheus text exposition format
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Histogram:
+    def __init__(self, bounds=buckets):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, result = 0, []
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+null_stage = NullStage()
+
+
+class Stage:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        if exc is not None:
+            self.metrics.error(self.name, exc)
+        return False
+
+
+class LogSink:
+    """Logs one line per stage and the counters on every flush."""
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger if logger is not None else logging.getLogger('sofia.metrics')
+        self.level = level
+
+    def __call__(self, snapshot):
+        for name, stage in sorted(snapshot['stages'].items()):
+            mean = stage['sum'] / stage['count'] if stage['count'] else 0.0
+            self.logger.log(self.level, 'stage %s: count=%d total=%.3fs mean=%.4fs', name, stage['count'],
+                            stage['sum'], mean)
+        if snapshot['counters']:
+            self.logger.log(self.level, 'counters: %s', ' '.join('{}={}'.format(name, value) for name, value in
+                                                                 sorted(snapshot['counters'].items())))
+        for (stage, kind), value in sorted(snapshot['errors'].items()):
+            self.logger.log(self.level, 'errors: stage=%s type=%s count=%d', stage, kind, value)
+
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.sinks = []
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.errors = {}
+
+    def stage(self, name):
+        if not self.enabled:
+            return null_stage
+        return Stage(self, name)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def error(self, stage, exc):
+        """Counts an error in `stage`; `exc` is an exception or a short description such as 'http_500'."""
+        if not self.enabled:
+            return
+        kind = exc if isinstance(exc, str) else type(exc).__name__
+        with self.lock:
+            self.errors[(stage, kind)] = self.errors.get((stage, kind), 0) + 1
+
+    def snapshot(self, reset=False):
+        with self.lock:
+            snapshot = {'stages': {name: {'count': h.count, 'sum': h.sum, 'buckets': h.cumulative()}
+                                   for name, h in self.histograms.items()},
+                        'counters': dict(self.counters),
+                        'errors': dict(self.errors)}
+            if reset:
+                self.histograms = {}
+                self.counters = {}
+                self.errors = {}
+            return snapshot
+
+    def merge(self, snapshot):
+        """Adds the metrics of a snapshot, e.g. one taken with reset=True in a worker process."""
+        with self.lock:
+            for name, stage in snapshot['stages'].items():
+                if name not in self.histograms:
+                    self.histograms[name] = Histogram()
+                histogram = self.histograms[name]
+                previous = 0
+                for index, (_, total) in enumerate(stage['buckets']):
+                    histogram.counts[index] += total - previous
+                    previous = total
+                histogram.sum += stage['sum']
+                histogram.count += stage['count']
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for key, value in snapshot['errors'].items():
+                self.errors[key] = self.errors.get(key, 0) + value
+
+    def prometheus_text(self):
+        snapshot = self.snapshot()
+        lines = []
+        if snapshot['stages']:
+            lines += ['# HELP sofia_stage_seconds Time spent in each pipeline stage.',
+                      '# TYPE sofia_stage_seconds histogram']
+            for name, stage in sorted(snapshot['stages'].items()):
+                for bound, total in stage['buckets']:
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('sofia_stage_seconds_bucket{{stage="{}",le="{}"}} {}'.format(name, le, total))
+                lines.append('sofia_stage_seconds_sum{{stage="{}"}} {}'.format(name, repr(stage['sum'])))
+                lines.append('sofia_stage_seconds_count{{stage="{}"}} {}'.format(name, stage['count']))
+        for name, value in sorted(snapshot['counters'].items()):
+            lines += ['# TYPE sofia_{}_total counter'.format(name), 'sofia_{}_total {}'.format(name, value)]
+        if snapshot['errors']:
+            lines.append('# TYPE sofia_errors_total counter')
+            for (stage, kind), value in sorted(snapshot['errors'].items()):
+                lines.append('sofia_errors_total{{stage="{}",type="{}"}} {}'.format(stage, kind, value))
+        return '\n'.join(lines) + '\n'
+
+    def add_sink(self, sink):
+        """Registers a callable that receives snapshot() on every flush()."""
+        self.sinks.append(sink)
+
+    def flush(self):
+        if not self.enabled or not self.sinks:
+            return
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink(snapshot)
+
+
+setting = os.getenv('SOFIA_METRICS', '').lower()
+metrics = Metrics(enabled=setting not in ('', '0', 'false', 'off'))
+if setting == 'log':
+    metrics.add_sink(LogSink())
+
+
+def enable(sink=None):
+    metrics.enabled = True
+    if sink is not None:
+        metrics.add_sink(sink)
+
+
+def disable():
+    metrics.enabled = False
+
+
+def stage(name):
+    return metrics.stage(name)
+
+
+def count(name, value=1):
+    metrics.count(name, value)
+
+
+def error(stage, exc):
+    metrics.error(stage, exc)
+
+
+def snapshot(reset=False):
+    return metrics.snapshot(reset)
+
+
+def merge(snapshot):
+    metrics.merge(snapshot)
+
+
+def prometheus_text():
+    return metrics.prometheus_text()
+
+
+def flush():
+    metrics.flush()
@@ -0,0 +1,58 @@
+from functools import lru_cache
+
+from sofia.semantic_units import intern_frame
+
+
+class LexicalClassifier:
+    """Combined FrameNet and ontology classification of a (lemma, POS) pair.
+
+    Neither `FrameNetFrames.refine_word` nor `Ontology.refine_word` depends on the sentence, and FrameNet
+    only on the coarse POS, so the (FN frames, FN type, ontology frame, ontology type) of the whole
+    known vocabulary is computed once at load time. Lemmas outside of it go through a bounded LRU.
+    Frames are interned, so the semantic units of a corpus share their frame strings.
+    """
+
+    def __init__(self, frameNet, ontology=None, cache_size=50000):
+        self.frameNet = frameNet
+        self.ontology = ontology
+        self.coarse_pos = {}
+        self.classify_unseen = lru_cache(maxsize=cache_size)(self.classify_lemma)
+        self.table = self.precompute()
+
+    def precompute(self):
+        vocabulary = set()
+        for term in self.frameNet.frame_LUs:
+            word, pos = term.rsplit('.', 1)
+            if pos in ('n', 'v', 'a'):
+                vocabulary.add((word, pos))
+        if self.ontology is not None:
+            for lemma in self.ontology.lemma_index:
+                for pos in ('n', 'v', 'a', 'None'):
+                    vocabulary.add((lemma, pos))
+        table = {}
+        for lemma, pos in vocabulary:
+            table[(lemma, pos)] = self.classify_lemma(lemma, pos)
+        return table
+
+    def classify_lemma(self, lemma, coarse_pos):
+        frame_FN, type_FN = self.frameNet.refine_lemma(lemma, coarse_pos)
+        frame_FN = intern_frame(frame_FN)
+        if self.ontology is None:
+            return frame_FN, type_FN, frame_FN, type_FN
+        frame, semantic_type = self.ontology.refine_word(None, lemma, coarse_pos)
+        return frame_FN, type_FN, intern_frame(frame), semantic_type
+
+    def get_coarse_pos(self, pos):
+        coarse = self.coarse_pos.get(pos)
+        if coarse is None:
+            coarse = self.frameNet.get_pos(pos)
+            self.coarse_pos[pos] = coarse
+        return coarse
+
+    def classify(self, lemma, pos):
+        """Returns (FN frames, FN type, ontology frame, ontology type) for a lemma and its POS tag."""
+        key = (lemma, self.get_coarse_pos(pos))
+        result = self.table.get(key)
+        if result is None:
+            result = self.classify_unseen(*key)
+        return result
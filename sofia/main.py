@@ -1,29 +1,41 @@
+import copy
 import json
+import logging
 import os
 from os import makedirs
 from os.path import exists
 
-import corenlp
-import pandas as pd
-import pdb
-
+from sofia import instrumentation
 from sofia.causal_extraction import CausalLinks
+from sofia.causal_triggers import TriggerLexicon
 from sofia.corenlp_parse import DataExtractor
 from sofia.event_extraction import CandidateEvents
+from sofia.frames_FN_mapping import FrameNetFrames
+from sofia.lexical_classifier import LexicalClassifier
+from sofia.memo import SentenceMemo, fingerprint, sentence_key
 from sofia.ontology_mapping import Ontology
+from sofia.output_format import compact_output, output_formats
+from sofia.output_store import OutputStore, output_stores
+from sofia.profiling import SlowDocProfiler, null_session
 from sofia.query_search import QueryFinder
+from sofia.routing import SentenceRouter
+from sofia.semantic_units import (SentenceResult, causal_headers, entity_headers, event_headers, output_records,
+                                  variable_headers)
+
+logger = logging.getLogger(__name__)
 
+# CoreNLP annotators per annotation profile. 'fast' drops the constituency parser; noun phrases are then
+# chunked from the dependencies (see DataExtractor).
+annotation_profiles = {'full': ['tokenize', 'ssplit', 'pos', 'parse', 'lemma', 'ner', 'depparse'],
+                       'fast': ['tokenize', 'ssplit', 'pos', 'lemma', 'ner', 'depparse']}
+# Annotators of the sentence split pass used to route long sentences.
+split_annotators = ['tokenize', 'ssplit']
 
-def span_to_index(local_index, span_list):
-    if span_list==0:
-        return ""
-    index=""
-    for span in span_list:
-        i= local_index[span]
-        if i!= "":
-            index+= i+ ', '
-    index= index.strip(', ')
-    return index
+def output_path(experiment, ontology_name=None):
+    """Output directory of an experiment. A SOFIA reading in several ontologies writes one per ontology."""
+    if ontology_name is None:
+        return f'sofia/data/{experiment}_output'
+    return f'sofia/data/{experiment}_output_{ontology_name}'
 
 class SOFIA:
     """SOFIA class. Can be invoked with:
@@ -40,44 +52,124 @@ class SOFIA:
        
        In this example, results is an array of JSON objects (one per sentence submitted to SOFIA).
        The final line writes this output to an Excel file at the user specified path.
+
+       With a list of ontologies, `SOFIA(['compositional_2.2', 'compositional_2.3'])`, every document is
+       annotated and structured once and grounded in each ontology by one of `sofia.readers`, which writes
+       its output to `output_path(experiment, ontology_name)`.
     """
 
-    def __init__(self, ontology_name):
-        self.causal_headers = ["Source_File", 'Query', "Score",  "Span", "Relation Index", "Relation", "Relation_Type",
-                               "Indicator", "Cause Index", "Cause", "Effect Index", "Effect", "Sentence"]
-        self.event_headers = ["Source_File", 'Query', "Score", "Event Index", "Span", "Sentence Span","Relation", "Event_Type",
-                              "FrameNet_Frame", "Indicator", "Location", "Time", 'Agent Index', "Agent",
-                              'Patient Index', "Patient", "Sentence"]
-        self.entity_headers = ["Source_File", 'Query', "Score", "Entity Index", "Span", "Sentence Span", "Entity", "Entity_Type",
-                               "FrameNet_Frame", "Indicator", "Qualifier", "Sentence"]
-        self.variable_headers = ["Source_File", 'Sentence', 'Indicator', 'Scoring', 'Index']
+    def __init__(self, ontology_name, trigger_lexicon=None, start_server=True, profiler=None, annotation_profile=None,
+                 max_sentence_tokens=None, long_sentences=None, max_chunk_chars=None, annotation_threads=None,
+                 sentence_memo=None, output_format=None, output_store=None):
+        self.causal_headers = causal_headers
+        self.event_headers = event_headers
+        self.entity_headers = entity_headers
+        self.variable_headers = variable_headers
         self.entity_index = 0
         self.event_index = 0
         self.variable_index = 0
         self.causal_index = 0
-        self.ontology_name = ontology_name
-
-        if os.getenv('CORENLP_HOME') is not None and os.getenv('CORENLP_HOME') != '':
-            print(f'using Stanford CoreNLP Server @ {os.getenv("CORENLP_HOME")}')
-            self.CoreNLPclient = corenlp.CoreNLPClient( start_server=True,
-                                                        be_quiet=True,
-                                                        timeout=100000,
-                                                        annotators=['tokenize',
-                                                                   'ssplit',
-                                                                   'pos',
-                                                                   'parse',
-                                                                   'lemma',
-                                                                   'ner',
-                                                                   'depparse'])
-            self.CoreNLPclient.annotate("hello world") # warmup the CoreNLP client and start the java server
-        else:
+        self.ontology_names = [ontology_name] if isinstance(ontology_name, str) else list(ontology_name)
+        self.ontology_name = self.ontology_names[0]
+        self.output_ontology = self.ontology_name if len(self.ontology_names) > 1 else None
+        self.trigger_lexicon = TriggerLexicon.load(trigger_lexicon)
+        self.ontology = Ontology(self.ontology_name)
+        # The FrameNet resources take seconds to load: they are loaded on first use (see lexicon) and
+        # shared with the readers of the other ontologies through this dict.
+        self.frame_net = {}
+        self._lexicon = None
+        self.profiler = profiler if profiler is not None else SlowDocProfiler.from_env()
+        # Results of sentences seen before (see sofia.memo); keys depend on the ontology and trigger lexicon.
+        self.memo = sentence_memo if sentence_memo is not None else SentenceMemo.from_env()
+        # 'legacy' records or the 'compact' format of sofia.output_format
+        self.output_format = output_format or os.getenv('SOFIA_OUTPUT_FORMAT') or 'legacy'
+        if self.output_format not in output_formats:
+            raise ValueError(f'unknown output format {self.output_format}, options are: {", ".join(output_formats)}')
+        # One {doc_id}.json file per document ('files') or an OutputStore of segment files ('segments')
+        self.output_store = output_store or os.getenv('SOFIA_OUTPUT_STORE') or 'files'
+        if self.output_store not in output_stores:
+            raise ValueError(f'unknown output store {self.output_store}, options are: {", ".join(output_stores)}')
+        # Output directory -> OutputStore, shared by the readers of all ontologies
+        self.stores = {}
+        self.memo_namespace = fingerprint(self.ontology.ontology, self.trigger_lexicon.digest)
+
+        # The CoreNLP client (and its Java server) is created on the first annotation, see CoreNLPclient.
+        # With start_server=False SOFIA only reads saved annotations (e.g. benchmarks).
+        self.start_server = start_server
+        self._CoreNLPclient = None
+        self.annotation_profile = annotation_profile or os.getenv('SOFIA_ANNOTATION_PROFILE') or 'full'
+        if self.annotation_profile not in annotation_profiles:
+            raise ValueError(f'unknown annotation profile {self.annotation_profile}, options are: '
+                             f'{", ".join(annotation_profiles)}')
+        # Sentences longer than max_sentence_tokens are annotated apart from the rest of the document, and
+        # the rest is sent in chunks of at most max_chunk_chars characters on annotation_threads threads
+        # (see sofia.routing). Both are off (0) by default: routing costs an extra tokenize/ssplit request
+        # per document, and the whole text is then sent in one request.
+        if max_sentence_tokens is None:
+            max_sentence_tokens = int(os.getenv('SOFIA_MAX_SENTENCE_TOKENS', '0'))
+        if max_chunk_chars is None:
+            max_chunk_chars = int(os.getenv('SOFIA_MAX_CHUNK_CHARS', '0'))
+        if annotation_threads is None:
+            annotation_threads = int(os.getenv('SOFIA_ANNOTATION_THREADS', '4'))
+        self.router = None
+        if max_sentence_tokens > 0 or max_chunk_chars > 0:
+            self.router = SentenceRouter(self.annotate_text, self.annotation_profile, max_sentence_tokens,
+                                         long_sentences or os.getenv('SOFIA_LONG_SENTENCES') or 'fast',
+                                         max_chunk_chars, annotation_threads)
+        # One reader per ontology; the others share everything but the ontology with this one
+        self.readers = [self] + [self.reader_for(name) for name in self.ontology_names[1:]]
+
+    def reader_for(self, ontology_name):
+        """A SOFIA for another ontology sharing the CoreNLP client, trigger lexicon and FrameNet resources."""
+        reader = copy.copy(self)
+        reader.ontology_name = ontology_name
+        reader.output_ontology = ontology_name
+        reader.ontology = Ontology(ontology_name)
+        reader._lexicon = None
+        reader.memo_namespace = fingerprint(reader.ontology.ontology, self.trigger_lexicon.digest)
+        reader.entity_index = 0
+        reader.event_index = 0
+        reader.variable_index = 0
+        reader.causal_index = 0
+        reader.readers = [reader]
+        return reader
+
+    @property
+    def lexicon(self):
+        if self._lexicon is None:
+            if 'frames' not in self.frame_net:
+                self.frame_net['frames'] = FrameNetFrames()
+            self._lexicon = LexicalClassifier(self.frame_net['frames'], self.ontology)
+        return self._lexicon
+
+    @property
+    def CoreNLPclient(self):
+        if self._CoreNLPclient is None:
+            self._CoreNLPclient = self.start_corenlp()
+        return self._CoreNLPclient
+
+    def start_corenlp(self):
+        if not self.start_server:
+            raise ValueError('SOFIA was created with start_server=False, cannot annotate text')
+        if os.getenv('CORENLP_HOME') is None or os.getenv('CORENLP_HOME') == '':
             raise ValueError('the "CORENLP_HOME" environment variable is not set, cannot run Stanford CoreNLP Server')
+        import corenlp
+        print(f'using Stanford CoreNLP Server @ {os.getenv("CORENLP_HOME")}')
+        client = corenlp.CoreNLPClient( start_server=True,
+                                        be_quiet=True,
+                                        timeout=100000,
+                                        annotators=annotation_profiles[self.annotation_profile])
+        client.annotate("hello world") # warmup the CoreNLP client and start the java server
+        return client
 
     def get_output(self, data_extractor, doc_id, scoring = False):
+        if self.memo is not None and not scoring:
+            return self.get_memo_output(data_extractor, doc_id)
         output = []
-        eventReader = CandidateEvents(data_extractor, self.ontology_name)
-        num_sentences = data_extractor.get_data_size()
-        all_events, all_entities = eventReader.get_semantic_units()
+        with instrumentation.stage('semantic_units'):
+            eventReader = CandidateEvents(data_extractor, lexicon=self.lexicon)
+            num_sentences = data_extractor.get_data_size()
+            all_events, all_entities = eventReader.get_semantic_units()
         self.eventReader = eventReader
         for s_index in range(num_sentences):
             events= all_events[s_index]
@@ -85,96 +177,104 @@ class SOFIA:
             sentence_output = self.sentence_output(doc_id, data_extractor, s_index, events, entities, 'None', 'None',
                                                    scoring = scoring)
             output.append(sentence_output)
+        if instrumentation.metrics.enabled:
+            instrumentation.count('entities', sum(len(i.entities) for i in output))
+            instrumentation.count('events', sum(len(i.events) for i in output))
+            instrumentation.count('relations', sum(len(i.relations) for i in output))
         return output
 
+    def get_memo_output(self, data_extractor, doc_id):
+        """get_output, taking the results of sentences seen before from the sentence memo."""
+        output = []
+        eventReader = CandidateEvents(data_extractor, lexicon=self.lexicon)
+        self.eventReader = eventReader
+        for s_index in range(data_extractor.get_data_size()):
+            key = sentence_key(self.memo_namespace, data_extractor.get_sentence_data(s_index))
+            offset = data_extractor.get_sentence_span(s_index)[0]
+            bases = dict(zip(('V', 'N', 'E', 'R'), self.get_counters()))
+            cached = self.memo.get(key)
+            if cached is not None:
+                sentence_output, counts = cached
+                output.append(sentence_output.shifted(doc_id, bases, offset))
+                self.set_counters([i + j for i, j in zip(self.get_counters(), counts)])
+                continue
+            with instrumentation.stage('semantic_units'):
+                events, entities = eventReader.get_sentence_units(s_index)
+            sentence_output = self.sentence_output(doc_id, data_extractor, s_index, events, entities, 'None', 'None')
+            output.append(sentence_output)
+            counts = [i - j for i, j in zip(self.get_counters(), bases.values())]
+            self.memo.put(key, (sentence_output.shifted('', {i: -j for i, j in bases.items()}, -offset), counts))
+        if instrumentation.metrics.enabled:
+            instrumentation.count('entities', sum(len(i.entities) for i in output))
+            instrumentation.count('events', sum(len(i.events) for i in output))
+            instrumentation.count('relations', sum(len(i.relations) for i in output))
+        return output
+
+    def get_counters(self):
+        return [self.variable_index, self.entity_index, self.event_index, self.causal_index]
+
+    def set_counters(self, counters):
+        self.variable_index, self.entity_index, self.event_index, self.causal_index = counters
+
     def sentence_output(self, doc_id, data_extractor, s_index, events, entities, query, query_finder, scoring = False):
-        output = {}
+        """Numbers the entities and events of a sentence, links them causally and returns a SentenceResult."""
         sentence= data_extractor.sentences[s_index]
-        ontology = Ontology(self.ontology_name)
+        data= data_extractor.get_sentence_data(s_index)
         self.variable_index += 1
-        variable_index = 'V{}'.format(self.variable_index)
         scores=''
         if scoring:
-            scores = ontology.string_matching(sentence, 'WorldBank')
-        output['Variables'] = dict(zip(self.variable_headers, [doc_id, sentence, query, str(scores), variable_index]))
-        lemmas= data_extractor.get_lemmas(s_index)
-        pos= data_extractor.get_pos_tags(s_index)
-        sentence_span= data_extractor.get_sentence_span(s_index)
-        entity_local_index = {}
-        entity_scores={}
-        output['Entities'] = []
-        for span in list(entities.keys()):
+            scores = self.ontology.string_matching(sentence, 'WorldBank')
+        for entity in entities.values():
             self.entity_index += 1
-            entity_index = 'N{}'.format(self.entity_index)
-            entity = entities[span]
-            entity_local_index[span] = entity_index
+            entity.id = 'N{}'.format(self.entity_index)
             #scores = ontologyMapper.stringMatching(entity["trigger"], 'WorldBank')
-            score=0.0
             if query_finder!= 'None':
-                score= query_finder.rank_node(entity, 'entity', sentence)
-                entity_scores[entity_index] = score
-            entity_info = [doc_id, query, str(score), entity_index, span, (int(span[0])-sentence_span[0], int(span[1])-sentence_span[0]),
-                           entity["trigger"].lower(), entity["frame"],
-                       str(entity["frame_FN"]), str(scores), entity['qualifier'].lower(), sentence]
-            output['Entities'].append(dict(zip(self.entity_headers,entity_info)))
-
-        event_local_index = {}
+                entity.score= query_finder.rank_node(entity, 'entity', sentence)
+
         event_scores={}
         event2Spans=[]
-        output['Events'] = []
-        for span in list(events.keys()):
-            event = events[span]
-            self.event_index += 1
-            event_index = 'E{}'.format(self.event_index)
-            event_local_index[span] = event_index
-            if 'property' in event['frame']:
+        sentence_events = []
+        for span, event in events.items():
+            if event.is_property():
                 event2Spans.append(span)
-                self.event_index -= 1
                 continue
-            patient = span_to_index(entity_local_index, event['patient'][0])
-            agent = span_to_index(entity_local_index, event['agent'][0])
-            score = 0.0
+            self.event_index += 1
+            event.id = 'E{}'.format(self.event_index)
             if query_finder != 'None':
-                score = query_finder.rank_node(event, 'event', sentence)
-            event_scores[event_index] = score
-
-            event_info = [doc_id, query, str(score), event_index, span, (int(span[0])-sentence_span[0], int(span[1])-sentence_span[0]),
-                          event["trigger"], event["frame"],
-                         str(event["frame_FN"]), str(scores), event['location'],
-                             event['temporal'], agent, event['agent'][1], patient, event['patient'][1], sentence]
-            output['Events'].append(dict(zip(self.event_headers,event_info)))
+                event.score = query_finder.rank_node(event, 'event', sentence)
+            event_scores[event.id] = event.score
+            sentence_events.append(event)
         ###############
         #Does this do anything???
         for span in event2Spans:
-            event = events[span]
             self.event_index += 1
-            event_index = 'E{}'.format(self.event_index)
-            event_local_index[span] = event_index
+            events[span].id = 'E{}'.format(self.event_index)
         #TODO: Fix the Causality Model
         #######
         #It currently chooses ALL the events. This is wrong, it should choose the ones that do not contain others as arguments
-        causal_detector = CausalLinks(events, event_local_index, event2Spans, entities, entity_local_index, sentence, lemmas, pos,
-                       event_scores, entity_scores)
-        causal_relations = causal_detector.get_causal_nodes()  ### OR TRUE
-        output['Causal'] = []
+        with instrumentation.stage('causal'):
+            causal_detector = CausalLinks(events, event2Spans, entities, sentence, data['lemmas'], data['pos'],
+                                          self.trigger_lexicon)
+            causal_relations = causal_detector.get_causal_nodes()  ### OR TRUE
         for relation in causal_relations:
             self.causal_index += 1
-            causal_index = 'R{}'.format(self.causal_index)
-            cause = relation["cause"]
-            effect = relation["effect"]
-            relation_type = relation['type']
-            score = 0.0
+            relation.id = 'R{}'.format(self.causal_index)
             if query_finder != 'None':
-                score = query_finder.rank_node((event_scores, cause[0], effect[0]), 'relation', sentence)
-            causal_info = [doc_id, query, str(score), sentence_span, causal_index, relation["trigger"], relation_type,
-                           str(scores), cause[0], cause[1], effect[0], effect[1], sentence]
-            output['Causal'].append(dict(zip(self.causal_headers,causal_info)))
-        return output
+                relation.score = query_finder.rank_node((event_scores, relation.cause, relation.effect), 'relation',
+                                                        sentence)
+        return SentenceResult(doc_id, query, sentence, data_extractor.get_sentence_span(s_index), data['location'],
+                              data['temporal'], scores, 'V{}'.format(self.variable_index), list(entities.values()),
+                              sentence_events, causal_relations)
 
     def get_online_output(self, text, doc_id, experiment='generic', save= True, scoring = False):
+        """Reads a document and writes its output; returns the output file (of the first ontology, see write_output)."""
         #if text!= None:
-        if not exists(f'sofia/data/{experiment}_output'):
-            makedirs(f'sofia/data/{experiment}_output')
+        for reader in self.readers:
+            if not exists(output_path(experiment, reader.output_ontology)):
+                makedirs(output_path(experiment, reader.output_ontology))
+        session = null_session
+        if self.profiler is not None:
+            session = self.profiler.start(doc_id, f'sofia/data/{experiment}/annotations/{doc_id}.json')
         try:
             #Change if new files might come in!
             #if os.path.exists(f'sofia/data/{experiment}/annotations/{doc_id}.json'):
@@ -182,24 +282,105 @@ class SOFIA:
                 annotations = self.load_annotations(experiment, doc_id)
             else:
                 annotations = self.annotate(text, experiment, save= save, doc_id= doc_id)
-            data_extractor = DataExtractor(annotations)
-            output = self.get_output(data_extractor, doc_id, scoring=scoring)
+            session.annotations = annotations
+            with instrumentation.stage('structure'):
+                data_extractor = DataExtractor(annotations)
+                if save:
+                    self.save_structured(data_extractor, experiment, doc_id)
             #print("output!")
-            data= {'entities': self.flatten([i['Entities'] for i in output]),
-                         'events': self.flatten([i['Events'] for i in output]),
-                         'causal': self.flatten([i['Causal'] for i in output])}
+            return self.ground(data_extractor, experiment, doc_id, scoring)
+        except Exception as e:
+            logger.exception(f'Reading failed for doc {doc_id}')
+            instrumentation.error('document', e)
+            return None
+        finally:
+            profile_path = session.stop()
+            if profile_path is not None:
+                logger.warning(f'Slow doc {doc_id}: profile written to {profile_path}')
+
+    def reground(self, doc_id, experiment='generic', scoring = False):
+        """Rewrites the output of a document read before, grounding it in the current ontology.
+
+        Only the ontology dependent steps run: the classification of the noun phrases and verbs of the
+        structured data saved by get_online_output, the argument and causal links that depend on it,
+        and the output. Documents read before the structured data was saved are rebuilt from their
+        annotations (and their structured data saved); CoreNLP is never called.
+        """
+        for reader in self.readers:
+            if not exists(output_path(experiment, reader.output_ontology)):
+                makedirs(output_path(experiment, reader.output_ontology))
+        try:
+            with instrumentation.stage('structure'):
+                if exists(f'sofia/data/{experiment}/structured/{doc_id}.json'):
+                    data_extractor = self.load_structured(experiment, doc_id)
+                else:
+                    data_extractor = DataExtractor(self.load_annotations(experiment, doc_id))
+                    self.save_structured(data_extractor, experiment, doc_id)
+            return self.ground(data_extractor, experiment, doc_id, scoring)
+        except Exception as e:
+            logger.exception(f'Regrounding failed for doc {doc_id}')
+            instrumentation.error('document', e)
+            return None
 
-            output_file = open(f'sofia/data/{experiment}_output/{doc_id}.json', 'w')
+    def ground(self, data_extractor, experiment, doc_id, scoring = False):
+        """Writes the output of a structured document in every ontology; returns the first output file."""
+        instrumentation.count('documents')
+        instrumentation.count('sentences', data_extractor.get_data_size())
+        output_files = []
+        for reader in self.readers:
+            output = reader.get_output(data_extractor, doc_id, scoring=scoring)
+            output_files.append(reader.write_output(output, experiment, doc_id))
+        return output_files[0]
+
+    def output_file(self, experiment, doc_id):
+        return f'{output_path(experiment, self.output_ontology)}/{doc_id}.json'
+
+    def get_store(self, experiment):
+        directory = output_path(experiment, self.output_ontology)
+        if directory not in self.stores:
+            self.stores[directory] = OutputStore(directory)
+        return self.stores[directory]
+
+    def write_output(self, output, experiment, doc_id):
+        """Writes the output of a document; returns its file (the segment file with the segments store)."""
+        with instrumentation.stage('write'):
+            if self.output_format == 'compact':
+                data = compact_output(output, doc_id)
+            else:
+                data = output_records(output)
+
+            if self.output_store == 'segments':
+                return self.get_store(experiment).put(doc_id, data)
+            output_file = open(self.output_file(experiment, doc_id), 'w')
             json.dump(data, output_file)
             output_file.close()
-            return output_file.name
-        except Exception as e:
-            print(e)
+        return output_file.name
+
+    def output_document(self, experiment, doc_id):
+        """The JSON output of a document as bytes (e.g. to upload it), or None if it was not written."""
+        if self.output_store == 'segments':
+            return self.get_store(experiment).read(doc_id)
+        if not exists(self.output_file(experiment, doc_id)):
             return None
+        with open(self.output_file(experiment, doc_id), 'rb') as f:
+            return f.read()
+
+    def save_structured(self, data_extractor, experiment, doc_id):
+        makedirs(f'sofia/data/{experiment}/structured', exist_ok=True)
+        with open(f'sofia/data/{experiment}/structured/{doc_id}.json', 'w') as f:
+            json.dump(data_extractor.get_structured(), f)
+
+    def load_structured(self, experiment, doc_id):
+        with open(f'sofia/data/{experiment}/structured/{doc_id}.json') as f:
+            return DataExtractor.from_structured(json.load(f))
 
 
     def annotate(self, text, experiment, save= 'True', doc_id= 'user_input'):
-        annotations = self.CoreNLPclient.annotate(text, output_format='json')
+        with instrumentation.stage('annotate'):
+            if self.router is not None:
+                annotations = self.router.annotate(text)
+            else:
+                annotations = self.annotate_text(text, self.annotation_profile)
         self.entityIndex = 0
         self.eventIndex = 0
         self.variableIndex = 0
@@ -208,6 +389,10 @@ class SOFIA:
             json.dump(annotations, open(f'sofia/data/{experiment}/annotations/{doc_id}.json', 'w'))
         return annotations
 
+    def annotate_text(self, text, profile):
+        annotators = split_annotators if profile == 'split' else annotation_profiles[profile]
+        return self.CoreNLPclient.annotate(text, annotators=annotators, output_format='json')
+
     def load_annotations(self, experiment, doc_id):
         if '.json' in doc_id:
             f=open(f'sofia/data/{experiment}/annotations/{doc_id}')
@@ -225,7 +410,7 @@ class SOFIA:
             try:
                 annotations = self.load_annotations(doc)
                 data_extractor = DataExtractor(annotations)
-                eventReader = CandidateEvents(data_extractor, self.ontology_name)
+                eventReader = CandidateEvents(data_extractor, lexicon=self.lexicon)
                 for query in queryList:
                     query_finder= QueryFinder(annotations, query)
                     data = eventReader.get_semantic_units()
@@ -268,10 +453,12 @@ class SOFIA:
         return [item for sublist in l for item in sublist]
 
     def results2excel(self, output_path, results):
-        variables = [i['Variables'] for i in results]
-        entities = self.flatten([i['Entities'] for i in results])
-        events = self.flatten([i['Events'] for i in results])
-        causal = self.flatten([i['Causal'] for i in results])
+        import pandas as pd
+        variables = [i.variable_record() for i in results]
+        records = output_records(results)
+        entities = records['entities']
+        events = records['events']
+        causal = records['causal']
 
         variables_df = pd.DataFrame(variables)[self.variable_headers]
         entities_df = pd.DataFrame(entities)[self.entity_headers]
@@ -0,0 +1,160 @@
+"""Memo of sentence results across documents.
+
+Boilerplate sentences (disclaimers, agency descriptions, repeated headlines) recur across a corpus, and
+every copy gives the same entities, events and relations. SentenceMemo keeps the result of a sentence
+keyed by a hash of its structured data (tokens, lemmas, POS tags, noun phrases, dependencies, dates and
+locations, with offsets relative to the sentence) and of the ontology, trigger lexicon and `memo_version`.
+Results (SentenceResult) are stored with sentence-relative offsets and sentence-local IDs (N1, E1, R1,
+V1, ...), which `SentenceResult.shifted` moves to the document offsets and IDs of each copy.
+
+The memo holds at most `max_entries` sentences in memory (least recently used are evicted) and, with a
+`path`, also persists them to a SQLite file shared by runs and worker processes. Configured with
+SOFIA_SENTENCE_MEMO (entries in memory; unset or 0 leaves the memo off) and SOFIA_SENTENCE_MEMO_PATH.
+
+Hashing a sentence costs a good part of extracting it, so the memo only pays off on corpora where a large
+share of the sentences repeat; `report()` gives the hit rate.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from sofia import instrumentation
+from sofia.semantic_units import SentenceResult
+
+# Bump when a change to the extraction changes sentence results, so persisted results are not reused.
+memo_version = 2
+
+
+def fingerprint(*parts):
+    return hashlib.blake2b(json.dumps([memo_version, parts], sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def sentence_features(data):
+    """The structured data of a sentence that its result depends on, with sentence-relative offsets."""
+    base = data['spans'][0][0] if data['spans'] else 0
+    tokens = [(token['token'], token['lemma'], token['pos'], token['start'] - base, token['end'] - base)
+              for token in data['tokens']]
+    noun_phrases = []
+    for noun_phrase in data['NPs']:
+        eventuality = noun_phrase['eventuality']
+        if eventuality:
+            eventuality = (eventuality['token'], eventuality['lemma'], eventuality['start'] - base,
+                           eventuality['end'] - base)
+        noun_phrases.append((noun_phrase['text'], noun_phrase['token'], noun_phrase['head_lemma'],
+                             noun_phrase['qualifier'], noun_phrase['start'] - base, noun_phrase['end'] - base,
+                             eventuality))
+    dependencies = [(dep['dep'], dep['governor'], dep['dependent']) for dep in data['deps']]
+    return [tokens, noun_phrases, dependencies, data['location'], data['temporal']]
+
+
+def sentence_key(namespace, data):
+    # repr is faster than JSON here, and as deterministic for the strings, numbers and tuples of the features
+    features = repr([memo_version, namespace, sentence_features(data)])
+    return hashlib.blake2b(features.encode(), digest_size=16).hexdigest()
+
+
+class SentenceMemo:
+    def __init__(self, max_entries=50000, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # Sentences in memory in the worker processes, by pid (see sofia.workers)
+        self.worker_entries = {}
+        self.connection = None
+        self.pid = None
+
+    @classmethod
+    def from_env(cls):
+        """Returns a memo configured from the SOFIA_SENTENCE_MEMO* variables, or None if it is turned off."""
+        max_entries = int(os.getenv('SOFIA_SENTENCE_MEMO') or '0')
+        if max_entries <= 0:
+            return None
+        return cls(max_entries, path=os.getenv('SOFIA_SENTENCE_MEMO_PATH') or None)
+
+    def database(self):
+        # SQLite connections do not survive a fork: every (worker) process opens its own.
+        if self.path is None:
+            return None
+        if self.connection is None or self.pid != os.getpid():
+            self.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None,
+                                              check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS sentences (key TEXT PRIMARY KEY, result TEXT)')
+            self.pid = os.getpid()
+        return self.connection
+
+    def get(self, key):
+        """Returns the (SentenceResult, ID counts) stored under `key`, or None."""
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                instrumentation.count('sentence_memo_hits')
+                return result
+            database = self.database()
+            row = None
+            if database is not None:
+                row = database.execute('SELECT result FROM sentences WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                instrumentation.count('sentence_memo_misses')
+                return None
+            sentence_output, counts = json.loads(row[0])
+            result = (SentenceResult.from_json(sentence_output), counts)
+            self.store(key, result)
+            self.hits += 1
+            self.disk_hits += 1
+            instrumentation.count('sentence_memo_hits')
+            return result
+
+    def put(self, key, result):
+        with self.lock:
+            self.store(key, result)
+            database = self.database()
+            if database is not None:
+                database.execute('INSERT OR IGNORE INTO sentences VALUES (?, ?)', (key, json.dumps([result[0].to_json(), result[1]])))
+
+    def store(self, key, result):
+        self.entries[key] = result
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def take_counts(self):
+        """Returns the lookups counted since the last call and resets them, for a worker to send to its parent."""
+        with self.lock:
+            counts = {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                      'entries': len(self.entries), 'pid': os.getpid()}
+            self.hits = self.disk_hits = self.misses = 0
+            self.worker_entries = {}
+        return counts
+
+    def merge_counts(self, counts):
+        with self.lock:
+            self.hits += counts['hits']
+            self.disk_hits += counts['disk_hits']
+            self.misses += counts['misses']
+            self.worker_entries[counts['pid']] = counts['entries']
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries) + sum(self.worker_entries.values()), 'hits': self.hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def report(self):
+        stats = self.stats()
+        return (f'sentence memo: {stats["hit_rate"]:.1%} hit rate ({stats["hits"]} hits, {stats["disk_hits"]} '
+                f'from disk, {stats["misses"]} misses), {stats["entries"]} sentences in memory')
+
+    def close(self):
+        if self.connection is not None and self.pid == os.getpid():
+            self.connection.close()
+        self.connection = None
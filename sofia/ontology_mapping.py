@@ -1,10 +1,13 @@
 import json
 import string
 import os
-import nltk
-from nltk.corpus import stopwords
 import yaml
 
+# Keys of the node groups of each semantic type: those written by format_ontology, then those of the
+# older Ontology_sofia.json (events1 are events, events2 properties, as events2 in CandidateEvents)
+semantic_type_keys = {'event': ('event', 'events1'), 'property': ('property', 'events2'),
+                      'entity': ('entity', 'entities')}
+
 class Ontology:
 
     # def __init__(self, ontology):
@@ -24,6 +27,7 @@ class Ontology:
 
     def __init__(self, ontology_name):
         self.dir= os.getcwd()
+        self.name= ontology_name
         file_name = f'/data/Ontology_{ontology_name}.json'
         #file_name = '/data/Ontology_wm.json'
         self.external_ontology=False
@@ -38,7 +42,30 @@ class Ontology:
             self.ontology= json.loads(text)
         indicator_path = os.path.dirname(os.path.abspath(__file__)) + '/data/Indicators_WorldBank_Full.txt'
         self.indicators_WorldBank= self.get_indicators(indicator_path)
+        self.lemma_index= self.index_lemmas()
+        self.stop_words= None
+
+    def index_lemmas(self):
+        """Maps every example lemma to its (frame, type); events take precedence over properties and
+        properties over entities, as in a sequential scan of the ontology."""
+        lemma_index={}
+        for semantic_type in ['event', 'property', 'entity']:
+            nodes= self.get_nodes(semantic_type)
+            for type in nodes.keys():
+                if not isinstance(nodes[type], list):
+                    continue
+                frame= type if semantic_type== 'entity' else semantic_type+ '/'+ type
+                for lemma in nodes[type]:
+                    if isinstance(lemma, str) and lemma not in lemma_index:
+                        lemma_index[lemma]= (frame, semantic_type)
+        return lemma_index
 
+    def get_nodes(self, semantic_type):
+        for key in semantic_type_keys[semantic_type]:
+            if key in self.ontology:
+                return self.ontology[key]
+        raise ValueError(f'ontology {self.name} has no {semantic_type} nodes: expected one of the keys '
+                         f'{", ".join(semantic_type_keys[semantic_type])}, found {", ".join(self.ontology)}')
 
     def get_indicators(self, path):
         f= open(path)
@@ -60,9 +87,15 @@ class Ontology:
                     term_scores[term]= score
         return term_scores
 
+    def get_stop_words(self):
+        if self.stop_words is None:
+            from nltk.corpus import stopwords
+            self.stop_words= frozenset(stopwords.words('english'))
+        return self.stop_words
+
     def score(self, phrase, key_term):
         punc= string.punctuation
-        stop_words= stopwords.words('english')
+        stop_words= self.get_stop_words()
         phrase= str(phrase.strip(' '))
         if phrase == key_term:
             return 1.0
@@ -82,17 +115,7 @@ class Ontology:
 
     def refine_word(self, sentence, lemma, pos):
         #if self.externalOntology: return self.refineWord_external(sentence, lemma, pos, fnFrames)
-        events1, events2, entities= self.ontology['event'], self.ontology['property'], self.ontology['entity']
-        for type in events1.keys():
-            if lemma in events1[type]:
-                return 'event/'+type, 'event'
-        for type in events2.keys():
-            if lemma in events2[type]:
-                return 'property/'+type, 'property'
-        for type in entities.keys():
-            if lemma in entities[type]:
-                return type, 'entity'
-        return "", ""
+        return self.lemma_index.get(lemma, ("", ""))
 
     def format_ontology(self, ontology_name, save_file):
         file_name = f'/data/Ontology_{ontology_name}.yml'
@@ -0,0 +1,128 @@
+"""Compact output format.
+
+The legacy output of a document, {'entities': [...], 'events': [...], 'causal': [...]}, repeats the
+sentence text, doc ID and query in every record and stringifies the FrameNet frames and indicator scores.
+The compact format keeps them once, in a per-document sentence table that the records point to by index,
+and uses JSON lists and numbers:
+
+    {"format": "sofia-compact", "version": 1, "document_id": "...", "query": "None",
+     "sentences": [{"text": "...", "span": [0, 57], "location": "", "time": "", "scores": null}, ...],
+     "entities": [{"id": "N1", "sentence": 0, "span": [0, 9], "text": "the rain", "type": "...",
+                   "frames": ["Precipitation"], "qualifier": "intense", "score": 0.0}, ...],
+     "events": [{"id": "E1", "sentence": 0, "span": [..], "trigger": "...", "type": "...", "frames": [...],
+                 "agents": ["N1"], "agent": "...", "patients": [], "patient": "", "score": 0.0}, ...],
+     "causal": [{"id": "R1", "sentence": 0, "trigger": "caused", "type": "...", "cause": "E1",
+                 "cause_text": "...", "effect": "E2", "effect_text": "...", "score": 0.0}, ...]}
+
+Spans are document offsets; `sentences[i].scores` is null when the sentences were not scored.
+`legacy_output` converts a compact document back to the legacy records, also from the command line:
+
+    python -m sofia.output_format sofia/data/aug2021_output/*.json --output legacy_output/
+"""
+import argparse
+import json
+import os
+
+format_name = 'sofia-compact'
+format_version = 1
+output_formats = ('legacy', 'compact')
+
+
+def compact_output(output, doc_id):
+    """Compacts the sentence results of a document (see SOFIA.get_output)."""
+    document = {'format': format_name, 'version': format_version, 'document_id': doc_id,
+                'query': output[0].query if output else 'None',
+                'sentences': [], 'entities': [], 'events': [], 'causal': []}
+    for index, result in enumerate(output):
+        document['sentences'].append({'text': result.sentence, 'span': list(result.span),
+                                      'location': result.location, 'time': result.temporal,
+                                      'scores': None if result.scores == '' else result.scores})
+        entity_ids = {}
+        for entity in result.entities:
+            entity_ids[entity.span] = entity.id
+            document['entities'].append({'id': entity.id, 'sentence': index, 'span': list(entity.span),
+                                         'text': entity.trigger.lower(), 'type': entity.frame,
+                                         'frames': entity.frame_FN or [], 'qualifier': entity.qualifier.lower(),
+                                         'score': float(entity.score)})
+        for event in result.events:
+            document['events'].append({'id': event.id, 'sentence': index, 'span': list(event.span),
+                                       'trigger': event.trigger, 'type': event.frame,
+                                       'frames': event.frame_FN or [],
+                                       'agents': [entity_ids[span] for span in event.agent.spans],
+                                       'agent': event.agent.text,
+                                       'patients': [entity_ids[span] for span in event.patient.spans],
+                                       'patient': event.patient.text, 'score': float(event.score)})
+        for relation in result.relations:
+            document['causal'].append({'id': relation.id, 'sentence': index, 'trigger': relation.trigger,
+                                       'type': relation.type, 'cause': relation.cause,
+                                       'cause_text': relation.cause_text, 'effect': relation.effect,
+                                       'effect_text': relation.effect_text, 'score': float(relation.score)})
+    return document
+
+
+def is_compact(document):
+    return document.get('format') == format_name
+
+
+def legacy_output(document):
+    """Converts a compact document to the legacy {'entities', 'events', 'causal'} records."""
+    if not is_compact(document):
+        return document
+    if document['version'] > format_version:
+        raise ValueError(f'compact output version {document["version"]} is newer than this reader '
+                         f'({format_version})')
+    doc_id = document['document_id']
+    query = document['query']
+    sentences = document['sentences']
+    indicators = ['' if sentence['scores'] is None else str(sentence['scores']) for sentence in sentences]
+    entities = []
+    for entity in document['entities']:
+        sentence = sentences[entity['sentence']]
+        begin = sentence['span'][0]
+        entities.append({'Source_File': doc_id, 'Query': query, 'Score': str(entity['score']),
+                         'Entity Index': entity['id'], 'Span': entity['span'],
+                         'Sentence Span': [entity['span'][0] - begin, entity['span'][1] - begin],
+                         'Entity': entity['text'], 'Entity_Type': entity['type'],
+                         'FrameNet_Frame': str(entity['frames']) if entity['frames'] else '',
+                         'Indicator': indicators[entity['sentence']], 'Qualifier': entity['qualifier'],
+                         'Sentence': sentence['text']})
+    events = []
+    for event in document['events']:
+        sentence = sentences[event['sentence']]
+        begin = sentence['span'][0]
+        events.append({'Source_File': doc_id, 'Query': query, 'Score': str(event['score']),
+                       'Event Index': event['id'], 'Span': event['span'],
+                       'Sentence Span': [event['span'][0] - begin, event['span'][1] - begin],
+                       'Relation': event['trigger'], 'Event_Type': event['type'],
+                       'FrameNet_Frame': str(event['frames']) if event['frames'] else '',
+                       'Indicator': indicators[event['sentence']], 'Location': sentence['location'],
+                       'Time': sentence['time'], 'Agent Index': ', '.join(event['agents']), 'Agent': event['agent'],
+                       'Patient Index': ', '.join(event['patients']), 'Patient': event['patient'],
+                       'Sentence': sentence['text']})
+    causal = []
+    for relation in document['causal']:
+        sentence = sentences[relation['sentence']]
+        causal.append({'Source_File': doc_id, 'Query': query, 'Score': str(relation['score']),
+                       'Span': sentence['span'], 'Relation Index': relation['id'], 'Relation': relation['trigger'],
+                       'Relation_Type': relation['type'], 'Indicator': indicators[relation['sentence']],
+                       'Cause Index': relation['cause'], 'Cause': relation['cause_text'],
+                       'Effect Index': relation['effect'], 'Effect': relation['effect_text'],
+                       'Sentence': sentence['text']})
+    return {'entities': entities, 'events': events, 'causal': causal}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert compact SOFIA outputs to the legacy format')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--output', type=str, required=True, help='directory of the converted files')
+    args = parser.parse_args()
+    os.makedirs(args.output, exist_ok=True)
+    for path in args.files:
+        with open(path) as f:
+            document = json.load(f)
+        with open(os.path.join(args.output, os.path.basename(path)), 'w') as f:
+            json.dump(legacy_output(document), f)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Segmented, append-only store of document outputs.
+
+With one JSON file per document, an output directory of 100k+ documents is slow to write to and to list,
+especially on NFS. An OutputStore keeps the outputs of a directory in a few large files instead:
+
+    sofia/data/{experiment}_output/
+        segments/00000001.gz    gzip members, one per document output (zcat gives one JSON per line)
+        segments/00000002.gz    a new segment is started once the last one reaches `segment_bytes`
+        index                   one 'doc_id <tab> segment <tab> offset <tab> length' line per output
+        lock
+
+Outputs are only ever appended. A commit appends the compressed documents to the last segment, syncs it
+and then appends their index lines in a single write, under an exclusive lock on `lock`: a document is
+visible once its index line is complete, and a crash leaves at most unindexed bytes in a segment. Writing
+a document again (e.g. regrounding) appends a new version; the last index line of a doc ID wins.
+`compact` rewrites the latest version of every document into new segments and drops the rest.
+
+Per-document JSON is exported on demand, for upload or from the command line:
+
+    python -m sofia.output_store export sofia/data/aug2021_output --output aug2021_json/ [--docs DOC_IDS_FILE]
+    python -m sofia.output_store compact sofia/data/aug2021_output
+    python -m sofia.output_store stats sofia/data/aug2021_output
+"""
+import argparse
+import fcntl
+import gzip
+import json
+import os
+from contextlib import contextmanager
+
+output_stores = ('files', 'segments')
+
+
+def is_store(directory):
+    return os.path.exists(os.path.join(directory, 'index'))
+
+
+class OutputStore:
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, sync=True):
+        self.directory = directory
+        self.segment_dir = os.path.join(directory, 'segments')
+        self.index_path = os.path.join(directory, 'index')
+        self.segment_bytes = segment_bytes
+        self.sync = sync
+        os.makedirs(self.segment_dir, exist_ok=True)
+        if not os.path.exists(self.index_path):
+            open(self.index_path, 'a').close()
+        # doc_id -> (segment, offset, length), read incrementally from the index
+        self.entries = {}
+        self.index_position = 0
+        self.index_inode = None
+
+    @contextmanager
+    def locked(self):
+        with open(os.path.join(self.directory, 'lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def segments(self):
+        return sorted(i for i in os.listdir(self.segment_dir) if i.endswith('.gz'))
+
+    def segment_path(self, segment):
+        return os.path.join(self.segment_dir, segment)
+
+    def put(self, doc_id, data):
+        """Commits the output of a document; returns the segment file it was written to."""
+        return self.commit([(doc_id, data)])
+
+    def commit(self, documents):
+        """Appends (doc_id, data) pairs and makes them visible together; returns the segment file."""
+        members = []
+        for doc_id, data in documents:
+            if '\t' in doc_id or '\n' in doc_id:
+                raise ValueError(f'doc ID {doc_id!r} contains a tab or a newline')
+            members.append((doc_id, gzip.compress(json.dumps(data).encode() + b'\n', compresslevel=6)))
+        with self.locked():
+            segments = self.segments()
+            segment = segments[-1] if segments else '00000001.gz'
+            path = self.segment_path(segment)
+            if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                segment = '{:08d}.gz'.format(int(segment[:-len('.gz')]) + 1)
+                path = self.segment_path(segment)
+            lines = []
+            with open(path, 'ab') as f:
+                offset = f.tell()
+                for doc_id, member in members:
+                    f.write(member)
+                    lines.append(f'{doc_id}\t{segment}\t{offset}\t{len(member)}\n')
+                    offset += len(member)
+                f.flush()
+                if self.sync:
+                    os.fsync(f.fileno())
+            self.append_index(''.join(lines).encode())
+        return path
+
+    def append_index(self, lines):
+        fd = os.open(self.index_path, os.O_RDWR | os.O_APPEND)
+        try:
+            # Drop the partial line of a commit that crashed while writing the index
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b'\n':
+                tail = os.pread(fd, min(size, 1 << 16), max(0, size - (1 << 16)))
+                os.ftruncate(fd, size - len(tail) + tail.rfind(b'\n') + 1)
+            os.write(fd, lines)
+            if self.sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def refresh(self):
+        """Reads the index lines committed since the last call (all of them after a compaction)."""
+        stat = os.stat(self.index_path)
+        if stat.st_ino != self.index_inode or stat.st_size < self.index_position:
+            self.entries = {}
+            self.index_position = 0
+            self.index_inode = stat.st_ino
+        if stat.st_size == self.index_position:
+            return
+        with open(self.index_path, 'rb') as f:
+            f.seek(self.index_position)
+            new_lines = f.read()
+        # A line is only committed once it is complete.
+        end = new_lines.rfind(b'\n') + 1
+        for line in new_lines[:end].decode().splitlines():
+            doc_id, segment, offset, length = line.split('\t')
+            self.entries[doc_id] = (segment, int(offset), int(length))
+        self.index_position += end
+
+    def __contains__(self, doc_id):
+        self.refresh()
+        return doc_id in self.entries
+
+    def doc_ids(self):
+        self.refresh()
+        return list(self.entries)
+
+    def read(self, doc_id):
+        """Returns the JSON output of a document as bytes, or None if it is not in the store."""
+        self.refresh()
+        if doc_id not in self.entries:
+            return None
+        try:
+            return self.read_entry(self.entries[doc_id])
+        except FileNotFoundError:
+            # Compacted since the index was read
+            self.index_inode = None
+            self.refresh()
+            return self.read_entry(self.entries[doc_id]) if doc_id in self.entries else None
+
+    def read_entry(self, entry):
+        segment, offset, length = entry
+        with open(self.segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            return gzip.decompress(f.read(length)).rstrip(b'\n')
+
+    def load(self, doc_id):
+        document = self.read(doc_id)
+        return None if document is None else json.loads(document)
+
+    def export(self, directory, doc_ids=None):
+        """Writes {doc_id}.json files of the documents (all of them by default); returns their number."""
+        os.makedirs(directory, exist_ok=True)
+        exported = 0
+        for doc_id in self.doc_ids() if doc_ids is None else doc_ids:
+            document = self.read(doc_id)
+            if document is None:
+                continue
+            with open(os.path.join(directory, f'{doc_id}.json'), 'wb') as f:
+                f.write(document)
+            exported += 1
+        return exported
+
+    def compact(self):
+        """Rewrites the latest output of every document into new segments and removes the old ones;
+        returns the (bytes before, bytes after)."""
+        with self.locked():
+            self.index_inode = None
+            self.refresh()
+            old_segments = self.segments()
+            before = sum(os.path.getsize(self.segment_path(i)) for i in old_segments)
+            number = int(old_segments[-1][:-len('.gz')]) if old_segments else 0
+            lines = []
+            out, segment, offset = None, None, 0
+            try:
+                for doc_id, entry in self.entries.items():
+                    if out is None or offset >= self.segment_bytes:
+                        if out is not None:
+                            self.close_segment(out)
+                        number += 1
+                        segment = '{:08d}.gz'.format(number)
+                        out, offset = open(self.segment_path(segment), 'wb'), 0
+                    with open(self.segment_path(entry[0]), 'rb') as f:
+                        f.seek(entry[1])
+                        out.write(f.read(entry[2]))
+                    lines.append(f'{doc_id}\t{segment}\t{offset}\t{entry[2]}\n')
+                    offset += entry[2]
+            finally:
+                if out is not None:
+                    self.close_segment(out)
+            temporary = self.index_path + '.tmp'
+            with open(temporary, 'w') as f:
+                f.write(''.join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.index_path)
+            for old in old_segments:
+                os.remove(self.segment_path(old))
+            after = sum(os.path.getsize(self.segment_path(i)) for i in self.segments())
+        return before, after
+
+    def close_segment(self, f):
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+
+    def stats(self):
+        self.refresh()
+        segments = self.segments()
+        size = sum(os.path.getsize(self.segment_path(i)) for i in segments)
+        live = sum(length for _, _, length in self.entries.values())
+        return {'documents': len(self.entries), 'segments': len(segments), 'bytes': size, 'live_bytes': live}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export or compact a SOFIA output store')
+    parser.add_argument('command', choices=['export', 'compact', 'stats'])
+    parser.add_argument('directory', help='output directory of the store, e.g. sofia/data/aug2021_output')
+    parser.add_argument('--output', type=str, default=None, help='directory of the exported {doc_id}.json files')
+    parser.add_argument('--docs', type=str, default=None, help='file of the doc IDs to export, one per line')
+    args = parser.parse_args()
+    if not is_store(args.directory):
+        parser.error(f'{args.directory} is not an output store')
+    store = OutputStore(args.directory)
+    if args.command == 'export':
+        if args.output is None:
+            parser.error('export needs --output')
+        doc_ids = None
+        if args.docs is not None:
+            with open(args.docs) as f:
+                doc_ids = [line.strip() for line in f if line.strip()]
+        print(f'exported {store.export(args.output, doc_ids)} documents to {args.output}')
+    elif args.command == 'compact':
+        before, after = store.compact()
+        print(f'compacted {args.directory}: {before} -> {after} bytes')
+    else:
+        print(json.dumps(store.stats()))
+
+
+if __name__ == '__main__':
+    main()
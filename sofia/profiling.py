@@ -0,0 +1,186 @@
+"""Opt-in profiling of slow documents.
+
+Set SOFIA_PROFILE_THRESHOLD (seconds) to profile every document read by get_online_output and keep the
+profile of the ones that take longer than the threshold. Each kept document is written to a bounded ring
+of directories under SOFIA_PROFILE_DIR (default `sofia/data/slow_docs`, SOFIA_PROFILE_KEEP entries,
+default 50) holding:
+
+    meta.json          doc ID, annotation cache key, latency, per-stage seconds (if metrics are enabled)
+    profile.txt        collapsed stacks (`sample` mode) or the top functions by cumulative time (`cprofile`)
+    profile.prof       pstats dump (`cprofile` mode only)
+    annotations.json   the CoreNLP annotations, so the document can be replayed with
+                       `benchmarks/bench_pipeline.py --replay DIR`
+
+SOFIA_PROFILE_MODE selects `sample` (default, a background thread samples the reading thread's stack
+every SOFIA_PROFILE_INTERVAL seconds) or `cprofile` (deterministic, but slows every document down).
+`sample` only sees the thread that called get_online_output: the threads that annotate the chunks of a
+long document (SOFIA_ANNOTATION_THREADS) are not sampled, so their time shows up as the reading thread
+waiting on them. Workers forked by sofia-pipeline.py share the ring, which is locked with flock.
+"""
+import cProfile
+import fcntl
+import io
+import json
+import os
+import pstats
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from sofia import instrumentation
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of one thread at a fixed interval and counts the collapsed stacks."""
+    def __init__(self, thread_id, interval):
+        threading.Thread.__init__(self, daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{}:{}'.format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.done.set()
+        self.join()
+        return self.stacks
+
+
+class NullSession:
+    @property
+    def annotations(self):
+        return None
+
+    @annotations.setter
+    def annotations(self, value):
+        pass
+
+    def stop(self):
+        return None
+
+
+null_session = NullSession()
+
+
+class ProfileSession:
+    def __init__(self, profiler, doc_id, cache_key):
+        self.profiler = profiler
+        self.doc_id = doc_id
+        self.cache_key = cache_key
+        self.annotations = None
+        self.stages = self.stage_seconds()
+        self.mode = profiler.mode
+        if self.mode == 'cprofile':
+            self.collector = cProfile.Profile()
+            try:
+                self.collector.enable()
+            except ValueError:
+                # Another document is already under cProfile (only one profiler can be active at a time).
+                self.mode = 'sample'
+        if self.mode == 'sample':
+            self.collector = StackSampler(threading.get_ident(), profiler.interval)
+            self.collector.start()
+        self.start = time.perf_counter()
+
+    def stage_seconds(self):
+        if not instrumentation.metrics.enabled:
+            return {}
+        return {name: stage['sum'] for name, stage in instrumentation.snapshot()['stages'].items()}
+
+    def stop(self):
+        """Stops profiling; returns the ring entry path if the document was slow enough to be kept."""
+        seconds = time.perf_counter() - self.start
+        if self.mode == 'cprofile':
+            self.collector.disable()
+            profile = self.collector
+        else:
+            profile = self.collector.stop()
+        if seconds < self.profiler.threshold:
+            return None
+        stages = {name: total - self.stages.get(name, 0.0) for name, total in self.stage_seconds().items()}
+        meta = {'doc_id': self.doc_id, 'cache_key': self.cache_key, 'seconds': seconds,
+                'threshold': self.profiler.threshold, 'mode': self.mode, 'time': time.time(),
+                'stages': {name: value for name, value in stages.items() if value > 0}}
+        return self.profiler.write(meta, profile, self.annotations)
+
+
+class SlowDocProfiler:
+    def __init__(self, threshold, path='sofia/data/slow_docs', keep=50, mode='sample', interval=0.005):
+        if mode not in ('sample', 'cprofile'):
+            raise ValueError(f'unknown profiling mode {mode}, options are: sample, cprofile')
+        self.threshold = threshold
+        self.path = path
+        self.keep = keep
+        self.mode = mode
+        self.interval = interval
+
+    @classmethod
+    def from_env(cls):
+        """Returns a profiler configured from the SOFIA_PROFILE_* variables, or None if they are unset."""
+        threshold = os.getenv('SOFIA_PROFILE_THRESHOLD')
+        if threshold is None or threshold == '':
+            return None
+        return cls(float(threshold),
+                   path=os.getenv('SOFIA_PROFILE_DIR', 'sofia/data/slow_docs'),
+                   keep=int(os.getenv('SOFIA_PROFILE_KEEP', '50')),
+                   mode=os.getenv('SOFIA_PROFILE_MODE', 'sample'),
+                   interval=float(os.getenv('SOFIA_PROFILE_INTERVAL', '0.005')))
+
+    def start(self, doc_id, cache_key=None):
+        return ProfileSession(self, doc_id, cache_key)
+
+    def entries(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(i for i in os.listdir(self.path) if re.match(r'\d{8}_', i))
+
+    @contextmanager
+    def locked(self):
+        # A file lock, so that the threads and the forked workers writing to the ring get distinct entries
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def write(self, meta, profile, annotations):
+        with self.locked():
+            entries = self.entries()
+            seq = int(entries[-1][:8]) + 1 if entries else 0
+            name = '{:08d}_{}'.format(seq, re.sub(r'[^\w.-]', '_', str(meta['doc_id']))[:100])
+            tmp = os.path.join(self.path, '.' + name)
+            os.makedirs(tmp, exist_ok=True)
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=1)
+            if isinstance(profile, cProfile.Profile):
+                profile.dump_stats(os.path.join(tmp, 'profile.prof'))
+                text = io.StringIO()
+                pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(40)
+                summary = text.getvalue()
+            else:
+                summary = ''.join('{} {}\n'.format(stack, count) for stack, count in profile.most_common())
+            with open(os.path.join(tmp, 'profile.txt'), 'w') as f:
+                f.write(summary)
+            if annotations is not None:
+                with open(os.path.join(tmp, 'annotations.json'), 'w') as f:
+                    json.dump(annotations, f)
+            os.rename(tmp, os.path.join(self.path, name))
+            for old in entries[:max(0, len(entries) + 1 - self.keep)]:
+                shutil.rmtree(os.path.join(self.path, old), ignore_errors=True)
+        return os.path.join(self.path, name)
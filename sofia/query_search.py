@@ -39,17 +39,17 @@ class QueryFinder:
         elif l< 20:
             node_score +=10
         if type== 'entity' or type== 'event':
-            if node['frame_FN']=='':
+            if node.frame_FN=='':
                 pass
-            elif len(set(node['frame_FN']).intersection(set(self.report_frames)))>0:
+            elif len(set(node.frame_FN).intersection(set(self.report_frames)))>0:
                 node_score+= 5
             else:
                 node_score+= 15
-            if node['frame']!= '':
+            if node.frame!= '':
                 node_score+= 25
-            if node['trigger'] == self.query:
+            if node.trigger == self.query:
                 node_score+= 40
-            elif self.query in node['trigger']:
+            elif self.query in node.trigger:
                 node_score+= 40
             else:
                 node_score+= 10
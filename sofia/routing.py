@@ -0,0 +1,134 @@
+"""Routes over-long sentences away from the full CoreNLP pipeline.
+
+Run-on "sentences" from PDF tables and lists make the constituency parser blow up. SentenceRouter first
+splits the text with a cheap tokenize/ssplit pass, then annotates runs of normal sentences with the
+requested profile and every sentence longer than `max_tokens` tokens on its own, either with the fast
+profile (`long_sentences='fast'`) or split at safe boundaries (`long_sentences='split'`). Runs of normal
+sentences are cut into chunks of at most `max_chunk_chars` characters (see sofia.chunking) and the pieces
+are annotated on `workers` threads. A piece that fails is logged and dropped, so the rest of the document
+still produces output. The pieces are stitched back with document offsets.
+"""
+import logging
+
+from sofia import instrumentation
+from sofia.chunking import annotate_concurrently, chunk_sentences
+from sofia.stitching import stitch_annotations
+
+logger = logging.getLogger(__name__)
+
+# Tokens after which a long sentence may be split, best first.
+split_boundaries = [{';', ':', '-LRB-', '-RRB-'}, {','}]
+
+
+def sentence_bounds(annotations):
+    """Returns [(begin, end, tokens)] character bounds and tokens of the sentences of an ssplit pass."""
+    bounds = []
+    for sentence in annotations['sentences']:
+        tokens = sentence['tokens']
+        if tokens:
+            bounds.append((tokens[0]['characterOffsetBegin'], tokens[-1]['characterOffsetEnd'], tokens))
+    return bounds
+
+
+def split_tokens(tokens, max_tokens):
+    """Splits the tokens of a long sentence into [(begin, end)] character ranges of at most `max_tokens`
+    tokens, cutting after the last punctuation boundary of each range where there is one."""
+    ranges = []
+    start = 0
+    while len(tokens) - start > max_tokens:
+        cut = start + max_tokens
+        for boundary in split_boundaries:
+            candidates = [i + 1 for i in range(start + 1, start + max_tokens) if tokens[i]['word'] in boundary]
+            if candidates:
+                cut = candidates[-1]
+                break
+        ranges.append((tokens[start]['characterOffsetBegin'], tokens[cut - 1]['characterOffsetEnd']))
+        start = cut
+    ranges.append((tokens[start]['characterOffsetBegin'], tokens[-1]['characterOffsetEnd']))
+    return ranges
+
+
+class SentenceRouter:
+    def __init__(self, annotate, profile='full', max_tokens=100, long_sentences='fast', max_chunk_chars=0,
+                 workers=1):
+        """`annotate(text, profile)` returns the CoreNLP JSON annotations of `text` with an annotation
+        profile ('split' for the tokenize/ssplit pass, or a key of sofia.main.annotation_profiles).
+        `max_tokens` or `max_chunk_chars` of 0 turn long sentence routing or chunking off."""
+        if long_sentences not in ('fast', 'split'):
+            raise ValueError(f'unknown long sentence strategy {long_sentences}, options are: fast, split')
+        self.annotate_text = annotate
+        self.profile = profile
+        self.max_tokens = max_tokens
+        self.long_sentences = long_sentences
+        self.max_chunk_chars = max_chunk_chars
+        self.workers = workers
+
+    def route(self, text):
+        """Returns the [(begin, end, profile, long_sentence)] pieces of `text` to annotate, in document order;
+        `long_sentence` marks a long sentence annotated whole, which is split if its annotation fails."""
+        bounds = sentence_bounds(self.annotate_text(text, 'split'))
+        pieces = []
+        run = []
+        for begin, end, tokens in bounds:
+            if not self.max_tokens or len(tokens) <= self.max_tokens:
+                run.append((begin, end))
+                continue
+            pieces += self.chunk_run(text, run)
+            run = []
+            instrumentation.count('long_sentences')
+            if self.long_sentences == 'fast':
+                pieces.append((begin, end, 'fast', True))
+            else:
+                pieces += [(piece_begin, piece_end, self.profile, False)
+                           for piece_begin, piece_end in split_tokens(tokens, self.max_tokens)]
+        return pieces + self.chunk_run(text, run)
+
+    def chunk_run(self, text, run):
+        if not run:
+            return []
+        if not self.max_chunk_chars:
+            return [(run[0][0], run[-1][1], self.profile, False)]
+        return [(begin, end, self.profile, False) for begin, end in chunk_sentences(text, run, self.max_chunk_chars)]
+
+    def annotate_piece(self, text, begin, end, profile):
+        try:
+            with instrumentation.stage('annotate_piece'):
+                return self.annotate_text(text[begin:end], profile)
+        except Exception as e:
+            logger.warning(f'Annotation of characters {begin}-{end} failed with profile {profile}: {e}')
+            return None
+
+    def annotate_routed_piece(self, text, begin, end, profile, long_sentence):
+        """Annotates one piece; returns [(char_offset, annotations)], empty if it failed."""
+        annotations = self.annotate_piece(text, begin, end, profile)
+        if annotations is None and long_sentence:
+            # The long sentence failed whole (also when the document profile is the fast one): split it
+            # at safe boundaries.
+            return self.annotate_split(text, begin, end)
+        return [(begin, annotations)] if annotations is not None else []
+
+    def annotate(self, text):
+        try:
+            pieces = self.route(text)
+        except Exception as e:
+            logger.warning(f'Sentence split failed, annotating the whole text: {e}')
+            return self.annotate_text(text, self.profile)
+        instrumentation.count('annotation_pieces', len(pieces))
+        annotated = annotate_concurrently(lambda *piece: self.annotate_routed_piece(text, *piece), pieces,
+                                          self.workers)
+        return stitch_annotations([piece for pieces in annotated for piece in pieces])
+
+    def annotate_split(self, text, begin, end):
+        try:
+            bounds = sentence_bounds(self.annotate_text(text[begin:end], 'split'))
+        except Exception as e:
+            instrumentation.error('annotate_split', e)
+            logger.warning(f'Sentence split of characters {begin}-{end} failed: {e}')
+            return []
+        annotated = []
+        for _, _, tokens in bounds:
+            for piece_begin, piece_end in split_tokens(tokens, self.max_tokens):
+                piece = self.annotate_piece(text, begin + piece_begin, begin + piece_end, self.profile)
+                if piece is not None:
+                    annotated.append((begin + piece_begin, piece))
+        return annotated
@@ -0,0 +1,218 @@
+"""Semantic units of a sentence and the output records built from them.
+
+CandidateEvents creates the Entity and Event objects of a sentence (keyed by character span while they are
+linked), CausalLinks links events into CausalRelation objects, and SOFIA.sentence_output numbers them and
+collects them in a SentenceResult, which writes the output records directly. The classes use __slots__:
+a corpus run creates millions of them.
+"""
+from sys import intern
+
+variable_headers = ["Source_File", 'Sentence', 'Indicator', 'Scoring', 'Index']
+entity_headers = ["Source_File", 'Query', "Score", "Entity Index", "Span", "Sentence Span", "Entity", "Entity_Type",
+                  "FrameNet_Frame", "Indicator", "Qualifier", "Sentence"]
+event_headers = ["Source_File", 'Query', "Score", "Event Index", "Span", "Sentence Span", "Relation", "Event_Type",
+                 "FrameNet_Frame", "Indicator", "Location", "Time", 'Agent Index', "Agent",
+                 'Patient Index', "Patient", "Sentence"]
+causal_headers = ["Source_File", 'Query', "Score", "Span", "Relation Index", "Relation", "Relation_Type",
+                  "Indicator", "Cause Index", "Cause", "Effect Index", "Effect", "Sentence"]
+
+
+def intern_frame(frame):
+    """Interns an ontology frame (or the strings of a list of frames), so equal frames share one string."""
+    if isinstance(frame, str):
+        return intern(frame)
+    if isinstance(frame, list):
+        return [intern(i) if isinstance(i, str) else i for i in frame]
+    return frame
+
+
+def shift_id(unit_id, bases):
+    """Shifts the number of an ID ('N3') by the base of its prefix; '' stays ''."""
+    if not unit_id:
+        return unit_id
+    return unit_id[0] + str(int(unit_id[1:]) + bases[unit_id[0]])
+
+
+def shift_span(span, offset):
+    return (span[0] + offset, span[1] + offset)
+
+
+def output_records(results):
+    """The legacy output of a document: the records of its SentenceResults."""
+    return {'entities': [record for result in results for record in result.entity_records()],
+            'events': [record for result in results for record in result.event_records()],
+            'causal': [record for result in results for record in result.causal_records()]}
+
+
+class Argument:
+    """Agent or patient of an event: the spans of the noun phrases it maps to and their text."""
+    __slots__ = ('spans', 'text')
+
+    def __init__(self, spans=(), text=''):
+        self.spans = spans
+        self.text = text
+
+    def shifted(self, offset):
+        return Argument([shift_span(span, offset) for span in self.spans], self.text) if self.spans else self
+
+
+no_argument = Argument()
+
+
+class Entity:
+    __slots__ = ('span', 'text', 'trigger', 'frame', 'frame_FN', 'qualifier', 'id', 'score')
+
+    def __init__(self, span, text, trigger, frame, frame_FN, qualifier, id='', score=0.0):
+        self.span = span
+        self.text = text
+        self.trigger = trigger
+        self.frame = frame
+        self.frame_FN = frame_FN
+        self.qualifier = qualifier
+        self.id = id
+        self.score = score
+
+    def shifted(self, bases, offset):
+        return Entity(shift_span(self.span, offset), self.text, self.trigger, self.frame, self.frame_FN,
+                      self.qualifier, shift_id(self.id, bases), self.score)
+
+
+class Event:
+    """An event or property. `index` is the token position of its trigger (the last token of a noun
+    phrase trigger, whose first token is `start_index`)."""
+    __slots__ = ('span', 'trigger', 'lemma', 'frame', 'frame_FN', 'location', 'temporal', 'agent', 'patient',
+                 'index', 'start_index', 'id', 'score')
+
+    def __init__(self, span, trigger, frame, frame_FN, location, temporal, lemma=None, index=None,
+                 agent=no_argument, patient=no_argument, start_index=None, id='', score=0.0):
+        self.span = span
+        self.trigger = trigger
+        self.lemma = lemma
+        self.frame = frame
+        self.frame_FN = frame_FN
+        self.location = location
+        self.temporal = temporal
+        self.agent = agent
+        self.patient = patient
+        self.index = index
+        self.start_index = start_index
+        self.id = id
+        self.score = score
+
+    def is_property(self):
+        return 'property' in self.frame
+
+    def shifted(self, bases, offset):
+        return Event(shift_span(self.span, offset), self.trigger, self.frame, self.frame_FN, self.location,
+                     self.temporal, self.lemma, self.index, self.agent.shifted(offset), self.patient.shifted(offset),
+                     self.start_index, shift_id(self.id, bases), self.score)
+
+
+class CausalRelation:
+    __slots__ = ('trigger', 'type', 'cause', 'cause_text', 'effect', 'effect_text', 'id', 'score')
+
+    def __init__(self, trigger, type, cause, cause_text, effect, effect_text, id='', score=0.0):
+        self.trigger = trigger
+        self.type = type
+        self.cause = cause
+        self.cause_text = cause_text
+        self.effect = effect
+        self.effect_text = effect_text
+        self.id = id
+        self.score = score
+
+    def shifted(self, bases):
+        return CausalRelation(self.trigger, self.type, shift_id(self.cause, bases), self.cause_text,
+                              shift_id(self.effect, bases), self.effect_text, shift_id(self.id, bases), self.score)
+
+
+class SentenceResult:
+    """The numbered entities, events (without properties) and causal relations of one sentence."""
+    __slots__ = ('doc_id', 'query', 'sentence', 'span', 'location', 'temporal', 'scores', 'id', 'entities',
+                 'events', 'relations')
+
+    def __init__(self, doc_id, query, sentence, span, location, temporal, scores, id, entities, events, relations):
+        self.doc_id = doc_id
+        self.query = query
+        self.sentence = sentence
+        self.span = span
+        self.location = location
+        self.temporal = temporal
+        self.scores = scores
+        self.id = id
+        self.entities = entities
+        self.events = events
+        self.relations = relations
+
+    def shifted(self, doc_id, bases, offset):
+        """A copy for another document: IDs shifted by `bases` (prefix -> number), offsets by `offset`."""
+        return SentenceResult(doc_id, self.query, self.sentence, shift_span(self.span, offset), self.location,
+                              self.temporal, self.scores, shift_id(self.id, bases),
+                              [entity.shifted(bases, offset) for entity in self.entities],
+                              [event.shifted(bases, offset) for event in self.events],
+                              [relation.shifted(bases) for relation in self.relations])
+
+    def variable_record(self):
+        return {'Source_File': self.doc_id, 'Sentence': self.sentence, 'Indicator': self.query,
+                'Scoring': str(self.scores), 'Index': self.id}
+
+    def entity_records(self):
+        begin = self.span[0]
+        indicator = str(self.scores)
+        return [{'Source_File': self.doc_id, 'Query': self.query, 'Score': str(entity.score),
+                 'Entity Index': entity.id, 'Span': entity.span,
+                 'Sentence Span': (entity.span[0] - begin, entity.span[1] - begin),
+                 'Entity': entity.trigger.lower(), 'Entity_Type': entity.frame,
+                 'FrameNet_Frame': str(entity.frame_FN), 'Indicator': indicator,
+                 'Qualifier': entity.qualifier.lower(), 'Sentence': self.sentence}
+                for entity in self.entities]
+
+    def event_records(self):
+        begin = self.span[0]
+        indicator = str(self.scores)
+        entity_ids = {entity.span: entity.id for entity in self.entities}
+        return [{'Source_File': self.doc_id, 'Query': self.query, 'Score': str(event.score),
+                 'Event Index': event.id, 'Span': event.span,
+                 'Sentence Span': (event.span[0] - begin, event.span[1] - begin),
+                 'Relation': event.trigger, 'Event_Type': event.frame, 'FrameNet_Frame': str(event.frame_FN),
+                 'Indicator': indicator, 'Location': event.location, 'Time': event.temporal,
+                 'Agent Index': ', '.join(entity_ids[span] for span in event.agent.spans), 'Agent': event.agent.text,
+                 'Patient Index': ', '.join(entity_ids[span] for span in event.patient.spans),
+                 'Patient': event.patient.text, 'Sentence': self.sentence}
+                for event in self.events]
+
+    def causal_records(self):
+        indicator = str(self.scores)
+        return [{'Source_File': self.doc_id, 'Query': self.query, 'Score': str(relation.score), 'Span': self.span,
+                 'Relation Index': relation.id, 'Relation': relation.trigger, 'Relation_Type': relation.type,
+                 'Indicator': indicator, 'Cause Index': relation.cause, 'Cause': relation.cause_text,
+                 'Effect Index': relation.effect, 'Effect': relation.effect_text, 'Sentence': self.sentence}
+                for relation in self.relations]
+
+    def to_dict(self):
+        """The legacy sentence output: {'Variables', 'Entities', 'Events', 'Causal'} records."""
+        return {'Variables': self.variable_record(), 'Entities': self.entity_records(),
+                'Events': self.event_records(), 'Causal': self.causal_records()}
+
+    def to_json(self):
+        """A JSON-serializable form of the result, read back by `from_json`."""
+        return [self.doc_id, self.query, self.sentence, self.span, self.location, self.temporal, self.scores,
+                self.id,
+                [[e.span, e.text, e.trigger, e.frame, e.frame_FN, e.qualifier, e.id, e.score]
+                 for e in self.entities],
+                [[e.span, e.trigger, e.frame, e.frame_FN, e.location, e.temporal, e.lemma, e.index,
+                  [e.agent.spans, e.agent.text], [e.patient.spans, e.patient.text], e.start_index, e.id, e.score]
+                 for e in self.events],
+                [[r.trigger, r.type, r.cause, r.cause_text, r.effect, r.effect_text, r.id, r.score]
+                 for r in self.relations]]
+
+    @classmethod
+    def from_json(cls, data):
+        doc_id, query, sentence, span, location, temporal, scores, id, entities, events, relations = data
+        entities = [Entity(tuple(e[0]), *e[1:]) for e in entities]
+        events = [Event(tuple(e[0]), *e[1:8], agent=Argument([tuple(i) for i in e[8][0]], e[8][1]),
+                        patient=Argument([tuple(i) for i in e[9][0]], e[9][1]), start_index=e[10], id=e[11],
+                        score=e[12])
+                  for e in events]
+        relations = [CausalRelation(*r) for r in relations]
+        return cls(doc_id, query, sentence, tuple(span), location, temporal, scores, id, entities, events, relations)
@@ -0,0 +1,34 @@
+"""Joins CoreNLP annotations of pieces of a document into the annotations of the whole document."""
+
+
+def shift_annotations(annotations, char_offset, sentence_offset=0, token_offset=0):
+    """Shifts the character offsets, sentence indices and document token indices of `annotations` in
+    place, for annotations of a text that starts `char_offset` characters into the document."""
+    for sentence in annotations['sentences']:
+        sentence['index'] = sentence.get('index', 0) + sentence_offset
+        for token in sentence['tokens']:
+            token['characterOffsetBegin'] += char_offset
+            token['characterOffsetEnd'] += char_offset
+        for mention in sentence.get('entitymentions', []):
+            mention['characterOffsetBegin'] += char_offset
+            mention['characterOffsetEnd'] += char_offset
+            if 'docTokenBegin' in mention:
+                mention['docTokenBegin'] += token_offset
+                mention['docTokenEnd'] += token_offset
+    return annotations
+
+
+def stitch_annotations(pieces):
+    """Stitches [(char_offset, annotations)] of consecutive pieces of a document, in document order, into
+    one annotation structure with document-level offsets and sentence indices."""
+    stitched = None
+    num_tokens = 0
+    for char_offset, annotations in pieces:
+        shift_annotations(annotations, char_offset, 0 if stitched is None else len(stitched['sentences']),
+                          num_tokens)
+        num_tokens += sum(len(sentence['tokens']) for sentence in annotations['sentences'])
+        if stitched is None:
+            stitched = dict(annotations, sentences=list(annotations['sentences']))
+        else:
+            stitched['sentences'] += annotations['sentences']
+    return stitched if stitched is not None else {'sentences': []}
@@ -0,0 +1,107 @@
+"""Pool of reading workers forked from a warm parent.
+
+The parent builds one SOFIA object and loads every read-only resource it uses (ontology, indicators,
+stop words, WordNet, FrameNet units, Lesk signatures, lexical classification table) before forking, so the
+workers share them copy-on-write instead of each loading its own copy, and a restarted worker is ready as
+soon as it is forked. The workers use the parent's CoreNLP server.
+
+    sofia = SOFIA('compositional_2.3')
+    with WarmPool(sofia, workers=16) as pool:
+        for doc_id, output_file in pool.read(docs, experiment):
+            ...
+
+`docs` yields (doc_id, text) pairs. Each result comes back with the metrics (sofia.instrumentation) and
+sentence memo lookups the worker recorded for it, which are merged into those of the parent, so
+`instrumentation.snapshot()` and `sofia.memo.report()` in the parent cover every worker.
+"""
+import gc
+import multiprocessing
+
+from sofia import instrumentation
+
+# The SOFIA object of the parent; workers inherit it through fork.
+worker_sofia = None
+
+
+def preload(sofia):
+    """Loads the resources SOFIA otherwise loads lazily on the first document."""
+    if sofia.start_server:
+        # Start the CoreNLP server once in the parent rather than once per worker.
+        sofia.CoreNLPclient
+    for reader in sofia.readers:
+        reader.ontology.get_stop_words()
+        reader.lexicon
+    frame_net = sofia.lexicon.frameNet
+    frame_net.lmtzer.lemmatize('preload')
+    frame_net.wsd.precompute()
+    # Objects that survive until the fork are never collected; keep the collector from touching
+    # (and so copying) their pages in the workers.
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+
+
+def start_worker():
+    # Drop the metrics and memo lookups inherited from the parent, which already counts them.
+    instrumentation.metrics.reset()
+    if worker_sofia.memo is not None:
+        worker_sofia.memo.take_counts()
+
+
+def worker_counts():
+    """The metrics and memo lookups of the worker since its last result."""
+    metrics = instrumentation.snapshot(reset=True) if instrumentation.metrics.enabled else None
+    memo = worker_sofia.memo.take_counts() if worker_sofia.memo is not None else None
+    return metrics, memo
+
+
+def read_document(job):
+    doc_id, text, experiment, save = job
+    return doc_id, worker_sofia.get_online_output(text, doc_id, experiment, save=save), worker_counts()
+
+
+def reground_document(job):
+    doc_id, experiment = job
+    return doc_id, worker_sofia.reground(doc_id, experiment), worker_counts()
+
+
+class WarmPool:
+    def __init__(self, sofia, workers=None, max_tasks_per_worker=None):
+        global worker_sofia
+        preload(sofia)
+        worker_sofia = sofia
+        self.sofia = sofia
+        context = multiprocessing.get_context('fork')
+        self.pool = context.Pool(workers, initializer=start_worker, maxtasksperchild=max_tasks_per_worker)
+
+    def read(self, docs, experiment, save=True):
+        """Reads (doc_id, text) pairs in the workers; yields (doc_id, output file or None) as documents finish."""
+        jobs = ((doc_id, text, experiment, save) for doc_id, text in docs)
+        return self.merge_counts(self.pool.imap_unordered(read_document, jobs))
+
+    def reground(self, doc_ids, experiment):
+        """Regrounds documents read before in the workers; yields (doc_id, output file or None)."""
+        jobs = ((doc_id, experiment) for doc_id in doc_ids)
+        return self.merge_counts(self.pool.imap_unordered(reground_document, jobs))
+
+    def merge_counts(self, results):
+        for doc_id, output, (metrics, memo) in results:
+            if metrics is not None:
+                instrumentation.merge(metrics)
+            if memo is not None:
+                self.sofia.memo.merge_counts(memo)
+            yield doc_id, output
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.pool.terminate()
+        return False
@@ -0,0 +1,78 @@
+import string
+from collections import OrderedDict
+
+
+class LeskDisambiguator:
+    """Simplified Lesk word sense disambiguation with cached signatures and contexts.
+
+    Gives the same senses as `nltk.wsd.lesk` (nltk 3.4, ties broken by synset name), but the definition
+    signature of every synset is split once, the candidate synsets of a (lemma, pos) pair are looked up
+    once and the context set of a sentence is built once for all the words disambiguated in it.
+    """
+
+    def __init__(self, context_cache_size=256):
+        self.signatures = {}
+        self.candidates = {}
+        self.contexts = OrderedDict()
+        self.context_cache_size = context_cache_size
+        self.punc = string.punctuation
+
+    def precompute(self):
+        """Fills the signature table for every WordNet synset, e.g. before forking workers."""
+        from nltk.corpus import wordnet as wn
+        for synset in wn.all_synsets():
+            if synset not in self.signatures:
+                self.signatures[synset] = frozenset(synset.definition().split())
+
+    def get_signature(self, synset):
+        signature = self.signatures.get(synset)
+        if signature is None:
+            signature = frozenset(synset.definition().split())
+            self.signatures[synset] = signature
+        return signature
+
+    def get_candidates(self, lemma, pos):
+        key = (lemma, pos)
+        candidates = self.candidates.get(key)
+        if candidates is None:
+            from nltk.corpus import wordnet as wn
+            synsets = wn.synsets(lemma)
+            if pos:
+                synsets = [ss for ss in synsets if str(ss.pos()) == pos]
+            candidates = [(ss, self.get_signature(ss)) for ss in synsets]
+            self.candidates[key] = candidates
+        return candidates
+
+    def get_context(self, sentence):
+        """The set of words of a sentence with surrounding punctuation stripped, cached per sentence."""
+        context = self.contexts.get(sentence)
+        if context is not None:
+            self.contexts.move_to_end(sentence)
+            return context
+        context = frozenset(word.strip(self.punc) for word in sentence.split(' '))
+        self.contexts[sentence] = context
+        if len(self.contexts) > self.context_cache_size:
+            self.contexts.popitem(last=False)
+        return context
+
+    def best_sense(self, context, lemma, pos):
+        best, best_key = None, None
+        for synset, signature in self.get_candidates(lemma, pos):
+            key = (len(context.intersection(signature)), synset.name())
+            if best_key is None or key > best_key:
+                best, best_key = synset, key
+        return best
+
+    def disambiguate(self, sentence, lemma, pos):
+        return self.best_sense(self.get_context(sentence), lemma, pos)
+
+    def disambiguate_sentence(self, sentence, words):
+        """Disambiguates every (lemma, pos) pair of a sentence at once; pos None skips the word."""
+        context = self.get_context(sentence)
+        senses = []
+        for lemma, pos in words:
+            if pos is None:
+                senses.append(None)
+            else:
+                senses.append(self.best_sense(context, lemma, pos))
+        return senses
@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from sofia.causal_triggers import TriggerLexicon, default_lexicon, verb_tags
+
+# The hard-coded trigger lists of CausalLinks.detect_causal_triggers before the lexicon:
+# lemma -> (direction, flips on a later 'by', verb only, relation type)
+old_triggers = {}
+for lemma in ['impact', 'affect', 'drive', 'lead', 'result', 'cause', 'so', 'hence', 'consequence']:
+    old_triggers[lemma] = ('left', True, False, 'CausalRelation')
+for lemma in ['because', 'due', 'since', 'as']:
+    old_triggers[lemma] = ('right', False, False, 'CausalRelation')
+for lemma in ['prevent', 'limit', 'restrict', 'constrain', 'block', 'bind', 'regulate']:
+    old_triggers[lemma] = ('left', True, True, 'PreventRelation')
+for lemma in ['relate', 'influence', 'correlate']:
+    old_triggers[lemma] = ('left', False, False, 'CorrelateRelation')
+for lemma in ['increase', 'decrease', 'reduce', 'boost', 'drop']:
+    old_triggers[lemma] = ('left', False, False, 'Increase/Decrease')
+
+
+def old_detect(lemmas, pos):
+    """The single-lemma trigger detection of the old CausalLinks, as (index, direction, type)."""
+    triggers = []
+    for index, lemma in enumerate(lemmas):
+        if lemma not in old_triggers:
+            continue
+        direction, flips, verb_only, relation_type = old_triggers[lemma]
+        if verb_only and pos[index] not in verb_tags:
+            continue
+        if flips and 'by' in lemmas[index + 1:]:
+            direction = 'right'
+        triggers.append((index, direction, relation_type))
+    return triggers
+
+
+class TestTriggerLexicon(unittest.TestCase):
+
+    def setUp(self):
+        self.lexicon = TriggerLexicon.load()
+
+    def test_old_trigger_set(self):
+        for lemma, (direction, flips, verb_only, relation_type) in old_triggers.items():
+            rule, length = self.lexicon.match([lemma], 0)
+            self.assertEqual(length, 1, lemma)
+            self.assertEqual(rule, (direction, self.lexicon.cue_bits['by'] if flips else 0, verb_only,
+                                    relation_type), lemma)
+
+    def test_same_as_old_detection(self):
+        sentences = [
+            (['drought', 'cause', 'crop', 'failure'], ['NN', 'VBD', 'NN', 'NN']),
+            (['crop', 'failure', 'be', 'cause', 'by', 'drought'], ['NN', 'NN', 'VBD', 'VBN', 'IN', 'NN']),
+            (['price', 'increase', 'because', 'supply', 'drop'], ['NNS', 'VBD', 'IN', 'NN', 'VBD']),
+            (['the', 'limit', 'be', 'reach'], ['DT', 'NN', 'VBD', 'VBN']),
+            (['aid', 'limit', 'hunger', 'so', 'death', 'reduce'], ['NN', 'VBD', 'NN', 'RB', 'NNS', 'VBD']),
+            (['access', 'be', 'block', 'by', 'fighting'], ['NN', 'VBD', 'VBN', 'IN', 'NN']),
+        ]
+        for lemmas, pos in sentences:
+            found = [(index, direction, relation_type)
+                     for index, direction, relation_type, _ in self.lexicon.find_triggers(lemmas, pos)]
+            self.assertEqual(found, old_detect(lemmas, pos), lemmas)
+
+    def test_longest_match(self):
+        lemmas = ['price', 'rise', 'as', 'a', 'result', 'of', 'drought']
+        self.assertEqual(self.lexicon.find_triggers(lemmas, ['NN'] * len(lemmas)),
+                         [(2, 'right', 'CausalRelation', 4)])
+        lemmas = ['drought', 'hit', ',', 'as', 'a', 'result', 'price', 'rise']
+        self.assertEqual(self.lexicon.find_triggers(lemmas, ['NN'] * len(lemmas)),
+                         [(3, 'left', 'CausalRelation', 3)])
+        lemmas = ['price', 'rise', 'as', 'supply', 'fall']
+        self.assertEqual(self.lexicon.find_triggers(lemmas, ['NN'] * len(lemmas)),
+                         [(2, 'right', 'CausalRelation', 1)])
+
+    def test_multi_word_triggers(self):
+        lemmas = ['conflict', 'lead', 'to', 'displacement']
+        self.assertEqual(self.lexicon.find_triggers(lemmas, ['NN', 'VBD', 'TO', 'NN']),
+                         [(1, 'left', 'CausalRelation', 2)])
+        lemmas = ['hunger', 'result', 'from', 'drought']
+        self.assertEqual(self.lexicon.find_triggers(lemmas, ['NN', 'VBD', 'IN', 'NN']),
+                         [(1, 'right', 'CausalRelation', 2)])
+        # A partial multi-word trigger falls back to its single-lemma prefix when that is a trigger
+        lemmas = ['drought', 'lead', 'hunger']
+        self.assertEqual(self.lexicon.find_triggers(lemmas, ['NN', 'VBD', 'NN']),
+                         [(1, 'left', 'CausalRelation', 1)])
+        # and matches nothing when it is not: 'give' alone is not a trigger
+        lemmas = ['hunger', 'give', 'rise']
+        self.assertEqual(self.lexicon.find_triggers(lemmas, ['NN', 'VBD', 'NN']), [])
+
+    def test_flip_on(self):
+        for trigger in [['lead', 'to'], ['result', 'in'], ['cause'], ['drive']]:
+            lemmas = ['displacement'] + trigger + ['by', 'conflict']
+            pos = ['NN'] + ['VBN'] * len(trigger) + ['IN', 'NN']
+            self.assertEqual(self.lexicon.find_triggers(lemmas, pos)[0][1], 'right', trigger)
+            lemmas = ['conflict'] + trigger + ['displacement']
+            pos = ['NN'] + ['VBD'] * len(trigger) + ['NN']
+            self.assertEqual(self.lexicon.find_triggers(lemmas, pos)[0][1], 'left', trigger)
+        # Only a cue after the trigger flips it
+        lemmas = ['by', 'then', 'conflict', 'cause', 'displacement']
+        self.assertEqual(self.lexicon.find_triggers(lemmas, ['IN', 'RB', 'NN', 'VBD', 'NN'])[0][1], 'left')
+
+    def test_verb_only(self):
+        self.assertEqual(self.lexicon.find_triggers(['the', 'block'], ['DT', 'NN']), [])
+        self.assertEqual(self.lexicon.find_triggers(['they', 'block'], ['PRP', 'VBP']),
+                         [(1, 'left', 'PreventRelation', 1)])
+
+    def test_digest_of_content(self):
+        with open(default_lexicon) as f:
+            data = json.load(f)
+        with tempfile.TemporaryDirectory() as directory:
+            copy_path, changed_path = os.path.join(directory, 'copy.json'), os.path.join(directory, 'changed.json')
+            shutil.copy(default_lexicon, copy_path)
+            data['triggers'] = data['triggers'][1:]
+            with open(changed_path, 'w') as f:
+                json.dump(data, f)
+            self.assertEqual(TriggerLexicon.load(copy_path).digest, self.lexicon.digest)
+            self.assertNotEqual(TriggerLexicon.load(changed_path).digest, self.lexicon.digest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from sofia.data_preprocess import remove_annotations
+
+
+def loop_remove_annotations(text_init, limit_left, limit_right):
+    """The character loop remove_annotations replaced, kept as the reference behaviour."""
+    annotation_spans={}
+    text= ''
+    i=0
+    new_i=0
+    while i< len(text_init):
+        letter_curr= text_init[i]
+        if limit_left== letter_curr:
+            annotation= letter_curr
+            loop= True
+            loop2 = True
+            start=0
+            end=1
+            while loop:
+                i += 1
+                letter_curr = text_init[i]
+                annotation+= letter_curr
+                if limit_right== letter_curr and loop2:
+                    i+=1
+                    letter_curr = text_init[i]
+                    annotation += letter_curr
+                    start = new_i
+                    while loop2:
+                        if limit_left== letter_curr:
+                            loop2=False
+                            end= new_i
+                            new_i-=1
+                        else:
+                            text += letter_curr
+                            i += 1
+                            new_i += 1
+                            letter_curr = text_init[i]
+                            annotation += letter_curr
+                elif limit_right== letter_curr:
+                    loop= False
+                    annotation_spans[(start, end)] = annotation
+        else:
+            text+= letter_curr
+        i += 1
+        new_i += 1
+    return text, annotation_spans
+
+
+texts = [
+    'No annotations at all.',
+    '<LOC>Juba<LOC> is the capital.',
+    'Floods hit <LOC>South Sudan<LOC> and <LOC>Ethiopia<LOC> in <TIME>2019<TIME>.',
+    '<EVENT>Drought<EVENT><LOC>Somalia<LOC>',
+    'Prices rose in <LOC>Kenya<LOC>',
+    'Multi\nline <ORG>World Food Programme<ORG> text\n\nwith <X><X> an empty annotation.',
+]
+
+
+class TestRemoveAnnotations(unittest.TestCase):
+
+    def test_same_as_loop(self):
+        for text in texts:
+            clean, spans, _ = remove_annotations(text, '<', '>')
+            self.assertEqual((clean, spans), loop_remove_annotations(text, '<', '>'), text)
+
+    def test_other_limits(self):
+        text = 'Rain in [LOC]Tigray[LOC] caused [EV]floods[EV].'
+        clean, spans, _ = remove_annotations(text, '[', ']')
+        self.assertEqual((clean, spans), loop_remove_annotations(text, '[', ']'))
+        self.assertEqual(clean, 'Rain in Tigray caused floods.')
+
+    def test_offsets_map_back(self):
+        for text in texts:
+            clean, spans, offset_map = remove_annotations(text, '<', '>')
+            for i, letter in enumerate(clean):
+                self.assertEqual(text[offset_map.to_original(i)], letter, (text, i))
+            for (start, end), annotation in spans.items():
+                begin, stop = offset_map.to_original(start), offset_map.to_original(end, end=True)
+                self.assertEqual(text[begin:stop], clean[start:end])
+                self.assertIn(text[begin:stop], annotation)
+
+    def test_unterminated_annotation_kept(self):
+        clean, spans, offset_map = remove_annotations('Rain in <LOC>Juba', '<', '>')
+        self.assertEqual(clean, 'Rain in <LOC>Juba')
+        self.assertEqual(spans, {})
+        self.assertEqual(offset_map.to_original(10), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import glob
+import os
+import unittest
+
+from sofia.ontology_mapping import Ontology
+
+data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sofia', 'data')
+
+
+def shipped_ontologies():
+    names = set()
+    for extension in ['json', 'yml']:
+        for path in glob.glob(os.path.join(data_dir, f'Ontology_*.{extension}')):
+            names.add(os.path.splitext(os.path.basename(path))[0][len('Ontology_'):])
+    return sorted(names)
+
+
+class TestOntology(unittest.TestCase):
+
+    def test_shipped_ontologies_index_lemmas(self):
+        self.assertTrue(shipped_ontologies())
+        for name in shipped_ontologies():
+            ontology = Ontology(name)
+            self.assertTrue(ontology.lemma_index, name)
+            semantic_types = {semantic_type for _, semantic_type in ontology.lemma_index.values()}
+            self.assertEqual(semantic_types, {'event', 'property', 'entity'}, name)
+
+    def test_sofia_keys(self):
+        ontology = Ontology('sofia')
+        self.assertEqual(ontology.refine_word(None, 'drought', 'n'),
+                         ('event/Natural_Phenomena/Weather/Drought', 'event'))
+        self.assertEqual(ontology.refine_word(None, 'forecast', 'n'), ('property/Forecasting/Likelihood', 'property'))
+        self.assertEqual(ontology.refine_word(None, 'river', 'n'), ('Locales/Natural_features', 'entity'))
+        self.assertEqual(ontology.refine_word(None, 'unknownword', 'n'), ('', ''))
+
+    def test_events_take_precedence(self):
+        ontology = Ontology.__new__(Ontology)
+        ontology.name = 'test'
+        ontology.ontology = {'entity': {'Food': ['rice']}, 'event': {'Trade': ['export', 'rice']},
+                             'property': {'Increase': ['rise', 'export']}}
+        self.assertEqual(ontology.index_lemmas(), {'export': ('event/Trade', 'event'),
+                                                   'rice': ('event/Trade', 'event'),
+                                                   'rise': ('property/Increase', 'property')})
+
+    def test_unknown_schema(self):
+        ontology = Ontology.__new__(Ontology)
+        ontology.name = 'test'
+        ontology.ontology = {'nodes': {'Food': ['rice']}}
+        with self.assertRaises(ValueError):
+            ontology.index_lemmas()
+
+
+if __name__ == '__main__':
+    unittest.main()
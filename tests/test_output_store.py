@@ -0,0 +1,123 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from sofia.output_store import OutputStore, is_store
+
+
+class TestOutputStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temporary = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temporary.name, 'aug2021_output')
+        self.store = OutputStore(self.directory, sync=False)
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def reader(self, **kwargs):
+        return OutputStore(self.directory, sync=False, **kwargs)
+
+    def index_lines(self):
+        with open(os.path.join(self.directory, 'index'), 'rb') as f:
+            return f.read().split(b'\n')
+
+    def test_round_trip(self):
+        data = [{'Entity': 'rain', 'Sentence': 'Heavy rain fell.'}]
+        self.store.put('doc1', data)
+        self.assertTrue(is_store(self.directory))
+        self.assertEqual(self.store.load('doc1'), data)
+        self.assertEqual(self.reader().read('doc1'), json.dumps(data).encode())
+        self.assertIsNone(self.store.read('doc2'))
+        self.assertNotIn('doc2', self.store)
+
+    def test_commit(self):
+        self.store.commit([('doc1', [1]), ('doc2', [2])])
+        self.assertEqual(sorted(self.reader().doc_ids()), ['doc1', 'doc2'])
+        self.assertEqual(self.reader().load('doc2'), [2])
+        with self.assertRaises(ValueError):
+            self.store.put('doc\t3', [3])
+
+    def test_last_version_wins(self):
+        reader = self.reader()
+        self.store.put('doc1', ['first'])
+        self.assertEqual(reader.load('doc1'), ['first'])
+        self.store.put('doc2', ['other'])
+        self.store.put('doc1', ['second'])
+        self.assertEqual(reader.load('doc1'), ['second'])
+        self.assertEqual(self.reader().load('doc1'), ['second'])
+        self.assertEqual(sorted(self.reader().doc_ids()), ['doc1', 'doc2'])
+
+    def test_segment_rollover(self):
+        store = self.reader(segment_bytes=10)
+        paths = [store.put('doc{}'.format(i), ['x' * 200, i]) for i in range(3)]
+        self.assertEqual([os.path.basename(path) for path in paths], ['00000001.gz', '00000002.gz', '00000003.gz'])
+        self.assertEqual(store.segments(), ['00000001.gz', '00000002.gz', '00000003.gz'])
+        # Small outputs share a segment until it reaches segment_bytes
+        store = self.reader(segment_bytes=1 << 20)
+        store.put('doc3', [3])
+        store.put('doc4', [4])
+        self.assertEqual(store.segments(), ['00000001.gz', '00000002.gz', '00000003.gz'])
+        reader = self.reader()
+        self.assertEqual([reader.load('doc{}'.format(i))[-1] for i in range(5)], [0, 1, 2, 3, 4])
+
+    def test_compact(self):
+        store = self.reader(segment_bytes=10)
+        for version in range(3):
+            for doc_id in ['doc1', 'doc2']:
+                store.put(doc_id, ['y' * 200, version])
+        stale, racing = self.reader(), self.reader()
+        self.assertEqual(stale.load('doc1'), ['y' * 200, 2])
+        racing.refresh()
+        old_segments = store.segments()
+        before, after = store.compact()
+        self.assertLess(after, before)
+        self.assertFalse(set(store.segments()) & set(old_segments))
+        stats = store.stats()
+        self.assertEqual((stats['documents'], stats['bytes']), (2, stats['live_bytes']))
+        # The stale reader's index points to the removed segments: it rereads the index
+        self.assertEqual(stale.load('doc1'), ['y' * 200, 2])
+        self.assertEqual(stale.load('doc2'), ['y' * 200, 2])
+        # A reader that refreshed just before the compaction finds the segment gone and rereads the index
+        refreshes = []
+
+        def refresh():
+            # The first refresh of the read ran before the compaction
+            if refreshes:
+                OutputStore.refresh(racing)
+            refreshes.append(racing.index_inode)
+
+        with mock.patch.object(racing, 'refresh', side_effect=refresh):
+            self.assertEqual(racing.load('doc1'), ['y' * 200, 2])
+        self.assertEqual(len(refreshes), 2)
+        store.put('doc1', ['new'])
+        self.assertEqual(stale.load('doc1'), ['new'])
+
+    def test_truncated_index_line(self):
+        self.store.put('doc1', [1])
+        # A commit that crashed while writing its index line
+        with open(os.path.join(self.directory, 'index'), 'ab') as f:
+            f.write(b'doc2\t00000001.gz\t4')
+        reader = self.reader()
+        self.assertEqual(reader.doc_ids(), ['doc1'])
+        self.assertIsNone(reader.load('doc2'))
+        self.store.put('doc3', [3])
+        lines = self.index_lines()
+        self.assertEqual(lines[-1], b'')
+        self.assertEqual([line.split(b'\t')[0] for line in lines[:-1]], [b'doc1', b'doc3'])
+        self.assertTrue(all(len(line.split(b'\t')) == 4 for line in lines[:-1]))
+        self.assertEqual(self.reader().load('doc3'), [3])
+        self.assertEqual(sorted(reader.doc_ids()), ['doc1', 'doc3'])
+
+    def test_export(self):
+        self.store.commit([('doc1', [1]), ('doc2', [2])])
+        output = os.path.join(self.temporary.name, 'json')
+        self.assertEqual(self.store.export(output, ['doc2', 'doc3']), 1)
+        with open(os.path.join(output, 'doc2.json')) as f:
+            self.assertEqual(json.load(f), [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import re
+import unittest
+
+from sofia.routing import SentenceRouter
+
+
+def annotate_words(text):
+    """CoreNLP-like annotations of `text`: whitespace tokens, sentences ending at a '.' token."""
+    sentences, tokens = [], []
+    for match in re.finditer(r'\S+', text):
+        tokens.append({'index': len(tokens) + 1, 'word': match.group(), 'characterOffsetBegin': match.start(),
+                       'characterOffsetEnd': match.end()})
+        if match.group() == '.':
+            sentences.append({'index': len(sentences), 'tokens': tokens})
+            tokens = []
+    if tokens:
+        sentences.append({'index': len(sentences), 'tokens': tokens})
+    return {'sentences': sentences}
+
+
+class FakeCoreNLP:
+    """Annotates with annotate_words; the profiles in `failing` fail on sentences over `max_tokens`."""
+    def __init__(self, failing=(), max_tokens=10):
+        self.failing = failing
+        self.max_tokens = max_tokens
+        self.calls = []
+
+    def __call__(self, text, profile):
+        self.calls.append((text, profile))
+        annotations = annotate_words(text)
+        if profile in self.failing and any(len(s['tokens']) > self.max_tokens for s in annotations['sentences']):
+            raise TimeoutError('CoreNLP request timed out')
+        return annotations
+
+
+def words(annotations):
+    return [[token['word'] for token in sentence['tokens']] for sentence in annotations['sentences']]
+
+
+class TestSentenceRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.text = 'Rain fell .\n' + ' , '.join('w{}'.format(i) for i in range(12)) + ' .\nPrices rose .'
+
+    def test_long_sentence_fast(self):
+        corenlp = FakeCoreNLP()
+        annotations = SentenceRouter(corenlp, 'full', max_tokens=10).annotate(self.text)
+        self.assertEqual(words(annotations), words(annotate_words(self.text)))
+        self.assertEqual([profile for _, profile in corenlp.calls], ['split', 'full', 'fast', 'full'])
+
+    def test_offsets_and_indices(self):
+        annotations = SentenceRouter(FakeCoreNLP(), 'full', max_tokens=10).annotate(self.text)
+        self.assertEqual([sentence['index'] for sentence in annotations['sentences']], [0, 1, 2])
+        for sentence in annotations['sentences']:
+            for token in sentence['tokens']:
+                self.assertEqual(self.text[token['characterOffsetBegin']:token['characterOffsetEnd']],
+                                 token['word'])
+
+    def test_split_when_fast_fails(self):
+        for profile in ['full', 'fast']:
+            corenlp = FakeCoreNLP(failing=('fast',))
+            annotations = SentenceRouter(corenlp, profile, max_tokens=10).annotate(self.text)
+            long_sentence = [word for sentence in words(annotations)[1:-1] for word in sentence]
+            self.assertEqual(long_sentence, words(annotate_words(self.text))[1], profile)
+            self.assertGreater(len(words(annotations)), 3, profile)
+
+    def test_split_long_sentences(self):
+        corenlp = FakeCoreNLP()
+        annotations = SentenceRouter(corenlp, 'full', max_tokens=10, long_sentences='split').annotate(self.text)
+        self.assertTrue(all(len(sentence) <= 10 for sentence in words(annotations)))
+        self.assertNotIn('fast', [profile for _, profile in corenlp.calls])
+
+    def test_failed_piece_dropped(self):
+        corenlp = FakeCoreNLP(failing=('fast', 'full'), max_tokens=3)
+        annotations = SentenceRouter(corenlp, 'full', max_tokens=10).annotate(self.text)
+        self.assertEqual(words(annotations), [['Rain', 'fell', '.'], ['Prices', 'rose', '.']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import copy
+import glob
+import json
+import os
+import unittest
+
+from sofia.routing import SentenceRouter
+from sofia.stitching import shift_annotations, stitch_annotations
+
+corpus_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'corpus')
+
+
+def document_text(annotations):
+    """The text the saved annotations were made from, with blanks between tokens."""
+    end = annotations['sentences'][-1]['tokens'][-1]['characterOffsetEnd']
+    text = [' '] * end
+    for sentence in annotations['sentences']:
+        for token in sentence['tokens']:
+            text[token['characterOffsetBegin']:token['characterOffsetEnd']] = token['originalText']
+    return ''.join(text)
+
+
+def chunk_annotations(annotations, begin, end):
+    """What a single request on text[begin:end] returns: the sentences inside it, with offsets relative to
+    `begin` and sentence indices from 0."""
+    sentences = [copy.deepcopy(sentence) for sentence in annotations['sentences']
+                 if begin <= sentence['tokens'][0]['characterOffsetBegin'] < end]
+    for index, sentence in enumerate(sentences):
+        sentence['index'] = index
+        for token in sentence['tokens']:
+            token['characterOffsetBegin'] -= begin
+            token['characterOffsetEnd'] -= begin
+    return {'sentences': sentences}
+
+
+def sentence_ranges(annotations, groups):
+    """Character ranges of consecutive groups of `groups` sentences."""
+    sentences = annotations['sentences']
+    ranges, start = [], 0
+    for size in groups:
+        group = sentences[start:start + size]
+        ranges.append((group[0]['tokens'][0]['characterOffsetBegin'], group[-1]['tokens'][-1]['characterOffsetEnd']))
+        start += size
+    return ranges
+
+
+class TestStitching(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = {}
+        for path in sorted(glob.glob(os.path.join(corpus_dir, '*.json'))):
+            with open(path) as f:
+                self.corpus[os.path.basename(path)] = json.load(f)
+
+    def assertSameAnnotations(self, stitched, single, msg=None):
+        self.assertEqual([sentence['index'] for sentence in stitched['sentences']],
+                         [sentence['index'] for sentence in single['sentences']], msg)
+        for stitched_sentence, sentence in zip(stitched['sentences'], single['sentences']):
+            self.assertEqual(stitched_sentence['tokens'], sentence['tokens'], msg)
+            self.assertEqual([(dep['dep'], dep['governor'], dep['dependent'])
+                              for dep in stitched_sentence['enhancedPlusPlusDependencies']],
+                             [(dep['dep'], dep['governor'], dep['dependent'])
+                              for dep in sentence['enhancedPlusPlusDependencies']], msg)
+        self.assertEqual(stitched, single, msg)
+
+    def test_stitch_chunks(self):
+        for name, single in self.corpus.items():
+            num_sentences = len(single['sentences'])
+            for groups in [[1, num_sentences - 1], [num_sentences - 1, 1], [1, 1, num_sentences - 2]]:
+                pieces = [(begin, chunk_annotations(single, begin, end))
+                          for begin, end in sentence_ranges(single, groups)]
+                self.assertSameAnnotations(stitch_annotations(pieces), single, (name, groups))
+
+    def test_router_chunks(self):
+        for name, single in self.corpus.items():
+            text = document_text(single)
+
+            def annotate(piece, profile):
+                begin = text.index(piece)
+                return chunk_annotations(single, begin, begin + len(piece))
+
+            for max_chunk_chars in [1, 80, 160]:
+                router = SentenceRouter(annotate, 'full', max_tokens=0, max_chunk_chars=max_chunk_chars, workers=3)
+                self.assertSameAnnotations(router.annotate(text), single, (name, max_chunk_chars))
+
+    def test_shift_entity_mentions(self):
+        annotations = {'sentences': [{'index': 0, 'tokens': [{'characterOffsetBegin': 0, 'characterOffsetEnd': 4}],
+                                      'entitymentions': [{'characterOffsetBegin': 0, 'characterOffsetEnd': 4,
+                                                          'docTokenBegin': 0, 'docTokenEnd': 1}]}]}
+        shift_annotations(annotations, 10, sentence_offset=2, token_offset=5)
+        sentence = annotations['sentences'][0]
+        self.assertEqual(sentence['index'], 2)
+        self.assertEqual(sentence['tokens'], [{'characterOffsetBegin': 10, 'characterOffsetEnd': 14}])
+        self.assertEqual(sentence['entitymentions'], [{'characterOffsetBegin': 10, 'characterOffsetEnd': 14,
+                                                       'docTokenBegin': 5, 'docTokenEnd': 6}])
+
+    def test_no_pieces(self):
+        self.assertEqual(stitch_annotations([]), {'sentences': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
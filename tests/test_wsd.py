@@ -0,0 +1,89 @@
+import unittest
+
+from sofia.wsd import LeskDisambiguator
+
+
+class Sense:
+    """A synset with a name and a definition, enough for LeskDisambiguator."""
+    def __init__(self, name, definition):
+        self._name = name
+        self._definition = definition
+
+    def name(self):
+        return self._name
+
+    def definition(self):
+        return self._definition
+
+
+def wordnet_or_skip(test):
+    from nltk.corpus import wordnet as wn
+    try:
+        wn.ensure_loaded()
+    except LookupError:
+        test.skipTest('the nltk WordNet data is not installed')
+    return wn
+
+
+class TestLeskDisambiguator(unittest.TestCase):
+
+    sentences = [
+        ('The bank raised the interest rate on loans .',
+         [('the', None), ('bank', 'n'), ('raise', 'v'), ('the', None), ('interest', 'n'), ('rate', 'n'),
+          ('on', None), ('loan', 'n'), ('.', None)]),
+        ('Floods washed away the river bank and the crops planted on it .',
+         [('flood', 'n'), ('wash', 'v'), ('away', None), ('the', None), ('river', 'n'), ('bank', 'n'),
+          ('and', None), ('the', None), ('crop', 'n'), ('plant', 'v'), ('on', None), ('it', None), ('.', None)]),
+        ('Drought caused severe hunger in the region .',
+         [('drought', 'n'), ('cause', 'v'), ('severe', 'a'), ('hunger', 'n'), ('in', None), ('the', None),
+          ('region', 'n'), ('.', None)]),
+    ]
+
+    def test_sentence_same_as_words(self):
+        wordnet_or_skip(self)
+        wsd = LeskDisambiguator()
+        for sentence, words in self.sentences:
+            senses = wsd.disambiguate_sentence(sentence, words)
+            self.assertEqual(len(senses), len(words))
+            for (lemma, pos), sense in zip(words, senses):
+                self.assertEqual(sense, None if pos is None else LeskDisambiguator().disambiguate(sentence, lemma, pos),
+                                 (sentence, lemma))
+
+    def test_sentence_same_as_words_without_wordnet(self):
+        wsd = LeskDisambiguator()
+        senses = {('bank', 'n'): [Sense('bank.n.01', 'sloping land beside a river'),
+                                  Sense('bank.n.02', 'a financial institution that accepts deposits')],
+                  ('rise', 'v'): [Sense('rise.v.01', 'move upward'), Sense('rise.v.02', 'increase in value')]}
+        for key, synsets in senses.items():
+            wsd.candidates[key] = [(synset, frozenset(synset.definition().split())) for synset in synsets]
+        sentence = 'The river rose over the bank .'
+        words = [('river', None), ('rise', 'v'), ('bank', 'n')]
+        self.assertEqual(wsd.disambiguate_sentence(sentence, words),
+                         [None] + [wsd.disambiguate(sentence, lemma, pos) for lemma, pos in words[1:]])
+        self.assertEqual([sense.name() for sense in wsd.disambiguate_sentence(sentence, words)[1:]],
+                         ['rise.v.02', 'bank.n.01'])
+
+    def test_same_as_nltk_lesk(self):
+        wordnet_or_skip(self)
+        from nltk.wsd import lesk
+        wsd = LeskDisambiguator()
+        for sentence, words in self.sentences:
+            context = [word.strip(wsd.punc) for word in sentence.split(' ')]
+            for lemma, pos in words:
+                if pos is not None:
+                    self.assertEqual(wsd.disambiguate(sentence, lemma, pos), lesk(context, lemma, pos),
+                                     (sentence, lemma))
+
+    def test_tie_broken_by_name(self):
+        wn = wordnet_or_skip(self)
+        from nltk.wsd import lesk
+        wsd = LeskDisambiguator()
+        # No definition shares a word with the context: every sense ties at 0
+        for lemma, pos in [('bank', 'n'), ('plant', 'v'), ('spring', None)]:
+            expected = max(synset for synset in wn.synsets(lemma) if pos is None or synset.pos() == pos)
+            self.assertEqual(wsd.disambiguate('xyzzy', lemma, pos), expected, lemma)
+            self.assertEqual(lesk(['xyzzy'], lemma, pos), expected, lemma)
+
+
+if __name__ == '__main__':
+    unittest.main()